@@ -1,8 +1,17 @@
+import os
+import shutil
+import tempfile
+import uuid
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from etl import load_data
 from analytics import AnalyticsEngine
+from storage import open_snapshot
+from bundle import Bundle
+from simulation import GravitySimulator
+from export import export_report
+from prefetch import PrefetchScheduler
+from charts import binned_density, downsample_series, stratified_sample
 
 # --- Configuration ---
 st.set_page_config(page_title="TVAnalytics | Scientific Dashboard", layout="wide", page_icon="🪐")
@@ -138,15 +147,25 @@ st.markdown("""
 
 # --- HELPER FUNCTIONS ---
 
-def card_30(title, value, subtext="", icon="analytics"):
-    """Renders a KPI card in AutoGravity 3.0 style."""
+def card_30(title, value, subtext="", icon="analytics", delta=None, ci=None):
+    """
+    Renders a KPI card in AutoGravity 3.0 style. delta: % change vs the comparison period.
+    ci: (low, high) formatted bounds when the value is a sample estimate.
+    """
+    delta_html = ""
+    if delta is not None and pd.notna(delta):
+        color = "#0bda68" if delta >= 0 else "#f43f5e"
+        delta_html = f'<span style="color: {color}; font-weight: 600;">{"▲" if delta >= 0 else "▼"} {abs(delta):.1f}%</span> · '
+    if ci is not None:
+        value = f"≈{value}"
+        subtext = f"95% CI {ci[0]} – {ci[1]} · {subtext}"
     st.markdown(f"""
     <div class="glass-panel" style="padding: 20px;">
         <div class="kpi-label">
             <span class="material-symbols-outlined" style="font-size: 18px;">{icon}</span> {title}
         </div>
         <div class="kpi-value neon-text">{value}</div>
-        <div style="color: #64748b; font-size: 0.8rem; margin-top: 4px;">{subtext}</div>
+        <div style="color: #64748b; font-size: 0.8rem; margin-top: 4px;">{delta_html}{subtext}</div>
     </div>
     """, unsafe_allow_html=True)
 
@@ -174,9 +193,143 @@ def insight_card_30(title, main_insight, desc, technical_data):
              </div>
              """, unsafe_allow_html=True)
 
+# --- PAGE COMPUTATIONS ---
+# Plain functions of an engine (no Streamlit calls), so the prefetch
+# scheduler can also run them on a background cursor.
+
+def compute_kpis(ae):
+    return ae.get_kpis()
+
+def compute_comparison(period):
+    return lambda ae: ae.get_period_comparison(period)
+
+def compute_mission_control(ae):
+    """Results behind the 7 insight cards."""
+    return {
+        'device_ratio': ae.get_device_ratio(),
+        # LTTB keeps long daily series at a bounded number of points
+        'trend': downsample_series(ae.get_time_series(), 'day', 'total_screentime'),
+        'geo_stats': ae.get_geographic_stats(),
+        'recurrence': ae.get_recurrence_metrics(),
+        'ranking': ae.get_top_content_ranking(k=3),
+    }
+
+def compute_top_genres(ae):
+    return ae.get_content_intelligence()['top_genres']
+
+def compute_qoe(ae):
+    """
+    QoE quantile sketches; percentiles and histograms are read from them.
+    Engines carrying the dataset's sketches (get_qoe) slice them instead of
+    re-reading events.
+    """
+    return ae.get_qoe_quantiles()
+
+def compute_sai(ae):
+    return ae.get_sai() if 'segment' in ae.columns and 'genre' in ae.columns else None
+
+def estimate_sai(ae):
+    return ae.estimate_sai() if 'segment' in ae.columns and 'genre' in ae.columns else None
+
+def compute_simulator(ae):
+    """Monte Carlo response surface; a slider move is a lookup."""
+    return GravitySimulator.from_engine(ae)
+
+def compute_clusters(n_clusters):
+    """
+    Clustering builder. Only bounded chart data leaves DuckDB: a 2D density
+    of the first two features (dominant cluster per bin) and a sample
+    stratified by cluster, both read from the clustered_events view.
+    """
+    def compute(ae):
+        _, ft = ae.perform_clustering(n_clusters)
+        result = {'features': ft, 'k_selection': ae.k_selection, 'density': pd.DataFrame(), 'sample': pd.DataFrame()}
+        if len(ft) >= 2:
+            result['density'] = binned_density(ae.con, 'clustered_events', ft[0], ft[1], color='cluster')
+            result['sample'] = stratified_sample(ae.con, 'clustered_events', ft[:2], 'cluster')
+        return result
+    return compute
+
+def compute_cohorts(period):
+    """Cohort grid builder; slicing the grid never rescans events."""
+    return lambda ae: ae.get_cohorts(period)
+
+# Results each page renders from; the other pages' ones are prefetched
+PAGE_TASKS = {
+    "Mission Control": {'mission_control': compute_mission_control, 'top_genres': compute_top_genres},
+    "Analytics": {'top_genres': compute_top_genres, 'qoe': compute_qoe},
+    "Experiments": {'sai': compute_sai, 'simulator': compute_simulator, 'clusters_auto': compute_clusters('auto'),
+                    'cohorts_month': compute_cohorts('month')},
+}
+
+@st.cache_resource
+def get_scheduler():
+    """Prefetch scheduler and result store shared by every session."""
+    return PrefetchScheduler()
+
+def page_result(task, compute):
+    """A page result for the current dataset + filters (cache_key), prefetched when possible."""
+    return get_scheduler().get(cache_key, task, compute, ae)
+
+def progressive_result(task, compute, estimate=None):
+    """
+    page_result, except in progressive mode: until the exact result is in the
+    store, returns estimate(ae) (None without an estimator) and queues the
+    exact computation ahead of the prefetch (see `refining`).
+    """
+    if not progressive or get_scheduler().progress(cache_key, [task])[0]:
+        return page_result(task, compute)
+    refining[task] = compute
+    return estimate(ae) if estimate else None
+
+@st.cache_resource
+def get_sample(key, _engine, size, error_target):
+    """Progressive sample of a dataset (key: source_key), built once per process."""
+    return _engine.get_sample(size=size, error_target=error_target)
+
+@st.cache_resource
+def get_qoe(key, _engine):
+    """QoE sketches of a whole dataset (key: source_key), built once per process."""
+    return _engine.get_qoe_quantiles()
+
+@st.cache_resource(max_entries=1)
+def get_bundle(path, mtime):
+    """Published bundle, loaded once per process (mtime picks up republished files)."""
+    return Bundle.load(path)
+
+@st.cache_resource(max_entries=1)
+def get_snapshot(path, mtime):
+    """Memory-mapped Arrow snapshot + profile, mapped once per process (mtime picks up republished files)."""
+    return open_snapshot(path)
+
+@st.fragment(run_every=2)
+def prefetch_status(tasks, refined=()):
+    if refined and get_scheduler().progress(cache_key, refined)[0] == len(refined):
+        # Exact results replace the estimates on screen
+        st.rerun()
+    ready, total = get_scheduler().progress(cache_key, tasks)
+    if ready < total:
+        st.progress(ready / total, text=f"Prefetching other pages: {ready}/{total}")
+    else:
+        st.caption("⚡ Other pages ready")
+
+def build_export(ae, fmt, include_events):
+    """Writes the report to a temp file (Parquet goes zipped) and returns its path."""
+    out_dir = tempfile.mkdtemp(prefix='tva_export_')
+    if fmt == 'xlsx':
+        path = os.path.join(out_dir, 'tvanalytics_report.xlsx')
+        export_report(ae, path, 'xlsx', include_events=include_events)
+        return path
+    export_report(ae, os.path.join(out_dir, 'tvanalytics_report'), fmt, include_events=include_events)
+    return shutil.make_archive(os.path.join(out_dir, 'tvanalytics_report'), 'zip', out_dir, 'tvanalytics_report')
+
 # --- DATA LOADING ---
 if 'dataset' not in st.session_state:
     st.session_state.dataset = None
+    st.session_state.profile = None
+    st.session_state.source_mtime = None
+    # Scopes this session's background prefetch (see PrefetchScheduler.prefetch)
+    st.session_state.session_id = uuid.uuid4().hex
 
 with st.sidebar:
     st.markdown("""
@@ -201,29 +354,123 @@ with st.sidebar:
     st.markdown("### 🔭 Global Filters")
     # Placeholders for filters - logic below
 
+# Optional Parquet event store (see storage.py): filters prune partitions instead of scanning everything.
+# Store-backed engines run out-of-core within TVA_MEMORY_LIMIT, spilling to TVA_SPILL_DIR.
+event_store = os.environ.get('TVA_EVENT_STORE')
+use_store = bool(event_store) and not uploaded_file
+engine_options = {'memory_limit': os.environ.get('TVA_MEMORY_LIMIT'), 'temp_directory': os.environ.get('TVA_SPILL_DIR')}
+# Optional Arrow snapshot (storage.write_snapshot): every server process maps the same file instead of parsing Excel.
+snapshot_path = os.environ.get('TVA_SNAPSHOT')
+use_snapshot = bool(snapshot_path) and not uploaded_file and not use_store
+# Optional published bundle (bundle.py): read-only, served from precomputed results without raw events.
+bundle_path = os.environ.get('TVA_BUNDLE')
+read_only = bool(bundle_path) and not uploaded_file
+
 data_source = uploaded_file if uploaded_file else 'autogravity_dataset.xlsx'
-try:
-    if st.session_state.dataset is None or uploaded_file:
-        loaded = load_data(data_source)
-        if loaded: st.session_state.dataset = loaded.get('dataset')
-except Exception as e:
-    st.error(f"Error loading data: {e}")
-    st.stop()
-
-df = st.session_state.dataset
-if df is None: st.warning("No Data"); st.stop()
-
-# Apply Sidebar Filters
+if read_only:
+    source_mtime = os.path.getmtime(bundle_path)
+    df = profile = None
+    base = get_bundle(bundle_path, source_mtime).view()
+elif use_store:
+    # write_event_store swaps in a new directory, so its mtime changes on every publish
+    source_mtime = os.path.getmtime(event_store)
+    df = None
+    base = AnalyticsEngine.from_event_store(event_store, **engine_options)
+elif use_snapshot:
+    source_mtime = os.path.getmtime(snapshot_path)
+    df, profile = get_snapshot(snapshot_path, source_mtime)
+    base = AnalyticsEngine(df, profile=profile)
+else:
+    try:
+        if st.session_state.dataset is None or uploaded_file:
+            loaded = load_data(data_source)
+            if loaded:
+                st.session_state.dataset = loaded.get('dataset')
+                st.session_state.profile = loaded.get('profile')
+                # Uploads are told apart by file_id; the workbook by its mtime when loaded
+                st.session_state.source_mtime = None if uploaded_file else os.path.getmtime(data_source)
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        st.stop()
+
+    df, profile = st.session_state.dataset, st.session_state.profile
+    source_mtime = st.session_state.source_mtime
+    if df is None: st.warning("No Data"); st.stop()
+    base = AnalyticsEngine(df, profile=profile)
+
+# Apply Sidebar Filters (choices come from SELECT DISTINCT, not a pandas copy)
 with st.sidebar:
-    selected_region = st.selectbox("Region", ["All"] + list(df['region'].unique()) if 'region' in df.columns else ["All"])
-    selected_device = st.selectbox("Device", ["All"] + list(df['device'].unique()) if 'device' in df.columns else ["All"])
+    selected_region = st.selectbox("Region", ["All"] + base.get_distinct_values('region'))
+    selected_device = st.selectbox("Device", ["All"] + base.get_distinct_values('device'))
+    date_range = None
+    bounds = base.get_time_bounds()
+    if bounds and not read_only:
+        picked = st.date_input("Date Range", value=(bounds[0].date(), bounds[1].date()),
+                               min_value=bounds[0].date(), max_value=bounds[1].date())
+        if isinstance(picked, (list, tuple)) and len(picked) == 2 and tuple(picked) != (bounds[0].date(), bounds[1].date()):
+            date_range = tuple(picked)
+    # A custom date range is compared with the equally long window before it
+    if read_only:
+        compare_period, progressive = None, False
+        published = base.bundle.manifest
+        st.info(f"📌 Published view ({published['created_at']}), read-only. Region/Device filter the KPIs, "
+                "leaders and trend; the other insights cover the whole view.")
+    else:
+        compare_period = date_range or st.selectbox("Compare With", ["month", "week", "day"],
+                                                    format_func=lambda p: f"Previous {p}")
+        # Sample-first: estimates with confidence intervals, replaced by exact results when ready
+        progressive = st.toggle("⚡ Progressive (sample first)", value=bool(os.environ.get('TVA_PROGRESSIVE')),
+                                help="Size with TVA_SAMPLE_SIZE (rows) or TVA_ERROR_TARGET (e.g. 0.02 for ±2%)")
 
-filtered_df = df.copy()
-if selected_region != "All": filtered_df = filtered_df[filtered_df['region'] == selected_region]
-if selected_device != "All": filtered_df = filtered_df[filtered_df['device'] == selected_device]
+filters = {'region': selected_region, 'device': selected_device}
+# Identifies the current dataset version + filter selection for cached computations
+# (the mtime keeps results of a republished or edited source from being served)
+source_key = (bundle_path if read_only else event_store if use_store else snapshot_path if use_snapshot
+              else (getattr(uploaded_file, 'file_id', None) or data_source), source_mtime)
+cache_key = (source_key, tuple(sorted(filters.items())), date_range)
+if read_only:
+    ae = base.filtered(filters=filters)
+elif use_store:
+    ae = AnalyticsEngine.from_event_store(event_store, filters=filters, date_range=date_range, **engine_options)
+else:
+    ae = AnalyticsEngine(df, filters=filters, date_range=date_range, profile=profile)
+# Exact tasks still computing while their estimates are shown (progressive mode)
+refining = {}
+if progressive:
+    error_target = float(os.environ['TVA_ERROR_TARGET']) if os.environ.get('TVA_ERROR_TARGET') else None
+    ae.sample = get_sample(source_key, base, int(os.environ.get('TVA_SAMPLE_SIZE', 20_000)), error_target)
+kpis = progressive_result('kpis', compute_kpis, AnalyticsEngine.estimate_kpis)
 
-ae = AnalyticsEngine(filtered_df)
-kpis = ae.get_kpis()
+def kpi_ci(key, fmt):
+    """Formatted confidence bounds of an estimated KPI; None once it is exact."""
+    if 'kpis' not in refining:
+        return None
+    return format(kpis[f'{key}_low'], fmt), format(kpis[f'{key}_high'], fmt)
+
+# Published bundles hold no previous period
+comparison = None if read_only else progressive_result(f'comparison_{compare_period}', compute_comparison(compare_period))
+comparison = comparison if comparison is not None else pd.DataFrame()
+kpi_deltas = comparison.iloc[0] if not comparison.empty else {}
+
+with st.sidebar:
+    # Exports stream raw events, which published bundles do not have
+    if not read_only:
+        with st.expander("📦 Export Report"):
+            export_format = st.selectbox("Format", ["xlsx", "parquet", "csv"], help="Parquet/CSV scale better for millions of events")
+            include_events = st.checkbox("Include filtered events", value=True)
+            if st.button("Prepare Export"):
+                with st.spinner("Streaming report..."):
+                    st.session_state.export_file = build_export(ae, export_format, include_events)
+            if st.session_state.get('export_file'):
+                with open(st.session_state.export_file, 'rb') as f:
+                    st.download_button("⬇️ Download", f, file_name=os.path.basename(st.session_state.export_file))
+
+    # Ingest profile: per-column nulls, coercion failures, cardinality and range
+    if ae.profile is not None:
+        with st.expander("🩺 Data Quality"):
+            st.dataframe(ae.profile.quality_report(), hide_index=True, use_container_width=True)
+            if ae.skipped_rows:
+                st.caption(f"Zone maps skipped {ae.skipped_rows:,} of {ae.profile.rows:,} rows for this filter.")
 
 # --- MAIN LAYOUT ---
 
@@ -243,24 +490,42 @@ if nav == "Mission Control":
 
     # Top KPI Row
     c1, c2, c3 = st.columns(3)
-    with c1: card_30("Active Users (Q1)", f"{kpis['active_customers']:,}", "Unique Identities", "group")
-    with c2: card_30("Total Volume", f"{kpis['total_screentime']:,.0f}", "Minutes Watched", "schedule")
-    with c3: card_30("Avg Completion", f"{kpis['avg_completion_pct']:.1f}%", "Content Stickiness", "check_circle")
+    with c1: card_30("Active Users (Q1)", f"{kpis['active_customers']:,.0f}", "Unique Identities", "group", kpi_deltas.get('active_customers_delta_pct'),
+                     kpi_ci('active_customers', ',.0f'))
+    with c2: card_30("Total Volume", f"{kpis['total_screentime']:,.0f}", "Minutes Watched", "schedule", kpi_deltas.get('total_screentime_delta_pct'),
+                     kpi_ci('total_screentime', ',.0f'))
+    with c3: card_30("Avg Completion", f"{kpis['avg_completion_pct']:.1f}%", "Content Stickiness", "check_circle", kpi_deltas.get('avg_completion_pct_delta_pct'),
+                     kpi_ci('avg_completion_pct', '.1f'))
+    if 'kpis' in refining:
+        st.caption(f"⚡ Estimated from {kpis['sample_rows']:,} sampled events; exact values are computing.")
+    if not comparison.empty:
+        current_label = "Selected range" if date_range else f"{kpi_deltas['period_start']:%Y-%m-%d} {compare_period}"
+        st.caption(f"Δ: {current_label} vs the previous {'window' if date_range else compare_period}.")
 
     st.markdown("### 🧠 The 7 Strategic Insights")
+    # Progressive mode: None until exact; genre and region leaders are estimated meanwhile
+    mc = progressive_result('mission_control', compute_mission_control)
+    refining_text = ("Refining…", "Computing the exact value in the background.", {'formula': 'pending', 'raw': None})
     t1, t2 = st.tabs(["Identity & Habits (1-4)", "Market & Growth (5-7)"])
     
     with t1:
         c_a, c_b = st.columns(2)
         with c_a:
             # Q1: Already covered in KPI, but let's add context
+            users_ci = kpi_ci('active_customers', ',.0f')
+            users = f"{kpis['active_customers']:,.0f}"
+            if users_ci is not None:
+                users = f"≈{users} Identities (estimate, 95% CI {users_ci[0]} – {users_ci[1]})"
+            else:
+                users = f"{users} Identities"
             insight_card_30("1. Active Customers", 
-                           f"{kpis['active_customers']} Identities",
+                           users,
                            "No contamos clics, contamos personas. Elimina el ruido de sesiones múltiples.",
-                           {'formula': 'COUNT(DISTINCT user_id)', 'raw': kpis['active_customers']})
+                           {'formula': 'COUNT(DISTINCT user_id)' + (' ~ KMV sample' if users_ci is not None else ''),
+                            'raw': kpis['active_customers']})
             
             # Q2: Genre
-            top_genre_df = ae.get_content_intelligence()['top_genres']
+            top_genre_df = progressive_result('top_genres', compute_top_genres, lambda ae: ae.estimate_breakdown('genre'))
             winner = top_genre_df.index[0] if not top_genre_df.empty else "N/A"
             insight_card_30("2. Dominant Genre",
                            f"{winner}",
@@ -269,14 +534,17 @@ if nav == "Mission Control":
         
         with c_b:
             # Q3: Devices
-            ratio = ae.get_device_ratio()
-            insight_card_30("3. Omnichannel Ratio",
-                           f"{ratio:.2f} Dev/User",
-                           ">1.0 means healthy mobility. Users are taking the app with them.",
-                           {'formula': 'AVG(COUNT(DISTINCT dev))', 'raw': ratio})
+            if mc is None:
+                insight_card_30("3. Omnichannel Ratio", *refining_text)
+            else:
+                ratio = mc['device_ratio']
+                insight_card_30("3. Omnichannel Ratio",
+                               f"{ratio:.2f} Dev/User",
+                               ">1.0 means healthy mobility. Users are taking the app with them.",
+                               {'formula': 'AVG(COUNT(DISTINCT dev))', 'raw': ratio})
             
             # Q4: Trend
-            trend = ae.get_time_series()
+            trend = mc['trend'] if mc is not None else pd.DataFrame()
             with st.container():
                 st.markdown('<div class="glass-panel"><h5>4. Monthly Trend</h5>', unsafe_allow_html=True)
                 if not trend.empty: st.line_chart(trend.set_index('day'), height=200)
@@ -286,7 +554,7 @@ if nav == "Mission Control":
         c_c, c_d = st.columns(2)
         with c_c:
              # Q5: Region
-            geo_stats = ae.get_geographic_stats()
+            geo_stats = mc['geo_stats'] if mc is not None else ae.estimate_breakdown('region')
             top_reg = geo_stats.iloc[0]['region'] if not geo_stats.empty else "N/A"
             insight_card_30("5. Regional Leader",
                            f"{top_reg}",
@@ -294,20 +562,26 @@ if nav == "Mission Control":
                            {'formula': 'SUM(watch_time) GROUP BY region', 'raw': top_reg})
             
             # Q7: Recurrence
-            rec = ae.get_recurrence_metrics()
-            insight_card_30("7. Recurrence Cycle",
-                           f"Every {rec['avg_recurrence_days']:.1f} Days",
-                           "The antidote to Churn. Measures how often users return.",
-                           {'formula': 'Avg(Date_n - Date_n-1)', 'raw': rec})
+            if mc is None:
+                insight_card_30("7. Recurrence Cycle", *refining_text)
+            else:
+                rec = mc['recurrence']
+                insight_card_30("7. Recurrence Cycle",
+                               f"Every {rec['avg_recurrence_days']:.1f} Days",
+                               "The antidote to Churn. Measures how often users return.",
+                               {'formula': 'Avg(Date_n - Date_n-1)', 'raw': rec})
             
         with c_d:
             # Q6: Top Content
-            ranking = ae.get_top_content_ranking()
-            top_1 = ranking.index[0] if not ranking.empty else "N/A"
-            insight_card_30("6. Top Title",
-                           f"#1 {top_1}",
-                           "The Pareto of Attention. This single title drives your retention.",
-                           {'formula': 'Ranking by WatchTime', 'raw': ranking.head(3).to_dict()})
+            if mc is None:
+                insight_card_30("6. Top Title", *refining_text)
+            else:
+                ranking = mc['ranking']
+                top_1 = ranking.index[0] if not ranking.empty else "N/A"
+                insight_card_30("6. Top Title",
+                               f"#1 {top_1}",
+                               "The Pareto of Attention. This single title drives your retention.",
+                               {'formula': 'SUM(watch_time) GROUP BY title ORDER BY 2 DESC LIMIT 3', 'raw': ranking.to_dict()})
 
 
 # 2. ANALYTICS (Content Intel)
@@ -319,45 +593,146 @@ elif nav == "Analytics":
     with col1:
         st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
         st.subheader("Genre Dominance")
-        top_genres = ae.get_content_intelligence()['top_genres']
+        top_genres = progressive_result('top_genres', compute_top_genres, lambda ae: ae.estimate_breakdown('genre'))
         st.bar_chart(top_genres['total_watch_time'], color="#1111d4")
+        if 'top_genres' in refining:
+            st.caption("⚡ Estimated from the sample; exact totals are computing.")
         st.markdown('</div>', unsafe_allow_html=True)
         
     with col2:
         card_30("Engagement Score", f"{kpis['avg_completion_pct']/10:.1f}/10", "Derived from Completion", "bolt")
         card_30("Quality Pref", "HD (1080p)", "Correlated with Long Sessions", "hd")
 
+    # Quality of Experience: percentiles and histogram from the QoE sketches
+    if not read_only:
+        ae.qoe = get_qoe(source_key, base)
+    qoe = page_result('qoe', compute_qoe) if not read_only else None
+    if qoe is not None and qoe.measures and qoe.by:
+        st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
+        st.subheader("Quality of Experience")
+        q1, q2 = st.columns(2)
+        qoe_measure = q1.selectbox("Measure", qoe.measures)
+        qoe_dim = q2.selectbox("Per", qoe.by)
+        st.dataframe(qoe.summary(qoe_measure, by=qoe_dim), hide_index=True, use_container_width=True)
+        hist = qoe.histogram(qoe_measure, bins=30)
+        st.bar_chart(hist.set_index(hist['bin_start'].round(2))['count'], color="#1111d4", height=200)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    # Period over period per dimension value (one windowed query)
+    breakdown_dims = [c for c in ['region', 'device', 'genre'] if c in ae.columns and not read_only]
+    if breakdown_dims:
+        st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
+        st.subheader("Period over Period")
+        breakdown_dim = st.selectbox("Breakdown", breakdown_dims)
+        breakdown = ae.get_period_comparison(compare_period, breakdown_dim)
+        if not breakdown.empty:
+            st.dataframe(breakdown[[breakdown_dim, 'total_screentime', 'previous_total_screentime', 'total_screentime_delta_pct',
+                                    'active_customers', 'previous_active_customers', 'active_customers_delta_pct']],
+                         hide_index=True, use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
 
 # 3. EXPERIMENTS (Deep Dives)
 elif nav == "Experiments":
+    # Plotly is only needed for these charts; importing it here keeps cold start light
+    import plotly.express as px
+
     st.markdown("<h1>Experiments <span style='font-weight:300;opacity:0.7'>// Deep Dives</span></h1>", unsafe_allow_html=True)
     
-    tab_sai, tab_sim, tab_clus = st.tabs(["SAI (Targeting)", "Gravity Sim", "Clustering AI"])
+    tab_sai, tab_sim, tab_clus, tab_coh = st.tabs(["SAI (Targeting)", "Gravity Sim", "Clustering AI", "Cohorts"])
     
     with tab_sai:
-        if 'segment' in df.columns and 'genre' in df.columns:
-            sai = ae.get_sai()
+        sai = progressive_result('sai', compute_sai, estimate_sai)
+        if sai is not None:
             st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
             st.plotly_chart(px.imshow(sai, text_auto=True, color_continuous_scale='RdBu_r'), use_container_width=True)
+            if 'sai' in refining:
+                st.caption("⚡ Estimated from the sample's weighted counts; the exact matrix is computing.")
             st.markdown('</div>', unsafe_allow_html=True)
             insight_card_30("SAI Analysis", "Red Cells (>120) = Fanatics", "Relative Passion Index. Shows over-indexing regardless of volume.", {'formula':'Matrix Division', 'raw':'SAI Matrix'})
 
     with tab_sim:
-        st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
-        boost = st.slider("Boost Watch Time %", 0, 50, 10)
-        base = kpis['total_screentime'] * 0.10
-        new_v = base * (1 + boost/100)
-        st.metric("Proj. Revenue", f"${new_v:,.0f}", delta=f"+${new_v-base:,.0f}")
-        st.progress(min(100, 50+boost))
-        st.markdown('</div>', unsafe_allow_html=True)
+        if read_only:
+            st.info("The simulator resamples raw events; open the live dashboard to run it.")
+        else:
+            st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
+            boost = st.slider("Boost Watch Time %", 0, 50, 10)
+            sim = page_result('simulator', compute_simulator).lookup(boost)
+            # Uplift over the simulator's own zero-boost baseline (users' screentime)
+            s1, s2 = st.columns(2)
+            with s1:
+                st.metric("Proj. Revenue", f"${sim['revenue']:,.0f}", delta=f"+${sim['uplift']:,.0f}")
+                st.caption(f"90% CI: ${sim['revenue_low']:,.0f} – ${sim['revenue_high']:,.0f} (bootstrap, 2,000 scenarios)")
+            with s2:
+                st.metric("Proj. LTV / User", f"${sim['ltv']:,.2f}")
+                st.caption(f"90% CI: ${sim['ltv_low']:,.2f} – ${sim['ltv_high']:,.2f}")
+            st.progress(min(100, 50+boost))
+            st.markdown('</div>', unsafe_allow_html=True)
     
     with tab_clus:
-        st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
-        try:
-            c_df, ft = ae.perform_clustering()
-            if not c_df.empty:
-                f3 = px.scatter(c_df, x=ft[0], y=ft[1], color='cluster', title="K-Means Tribes")
-                f3.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font_color="white")
-                st.plotly_chart(f3, use_container_width=True)
-        except: st.error("Clustering Error")
-        st.markdown('</div>', unsafe_allow_html=True)
+        if read_only:
+            st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
+            st.subheader("K-Means Tribes (published view)")
+            st.dataframe(ae.get_cluster_summary(), hide_index=True, use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+        else:
+            st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
+            n_clusters = st.selectbox("Tribes (k)", ['auto'] + list(range(2, 9)),
+                                      help="'auto' compares k = 2..8 on a sample (silhouette, Davies-Bouldin, elbow)")
+            try:
+                clusters = page_result(f'clusters_{n_clusters}', compute_clusters(n_clusters))
+                ft, k_selection = clusters['features'], clusters['k_selection']
+                if k_selection is not None:
+                    st.caption(f"Selected k = {k_selection['k']} by a silhouette / Davies-Bouldin / elbow vote (elbow at k = {k_selection['elbow_k']}, "
+                               f"{len(k_selection['scores'])} candidates in {k_selection['elapsed_s']:.1f}s, {k_selection['stopped'].replace('_', ' ')}).")
+                view = st.radio("View", ["Density", "Sample"], horizontal=True,
+                                help="Density bins every event; Sample plots a few thousand events stratified by tribe")
+                c_df = clusters['density'] if view == "Density" else clusters['sample']
+                if not c_df.empty:
+                    c_df = c_df.assign(cluster=c_df['cluster'].astype(str))
+                    f3 = px.scatter(c_df, x=ft[0], y=ft[1], color='cluster', title="K-Means Tribes",
+                                    size='count' if view == "Density" else None)
+                    f3.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font_color="white")
+                    st.plotly_chart(f3, use_container_width=True)
+                if k_selection is not None:
+                    with st.expander("k selection scores"):
+                        st.dataframe(k_selection['scores'], use_container_width=True)
+            except: st.error("Clustering Error")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+    with tab_coh:
+        if read_only:
+            st.info("Cohorts are built from raw events; open the live dashboard to explore them.")
+        else:
+            st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
+            k1, k2 = st.columns(2)
+            cohort_period = k1.selectbox("Cohort", ["month", "week"], format_func=lambda p: f"First active {p}")
+            cohort_metric = k2.selectbox("Metric", ["retention", "active_users", "screentime"])
+            cohorts = page_result(f'cohorts_{cohort_period}', compute_cohorts(cohort_period))
+            # Slice by the attributes users had when they were acquired
+            slices = {}
+            slicers = st.columns(max(len(cohorts.by), 1))
+            for col, slicer in zip(cohorts.by, slicers):
+                slices[col] = slicer.selectbox(f"Acquired in {col}", ["All"] + cohorts.values(col))
+            grid = cohorts.matrix(cohort_metric, **slices)
+            if not grid.empty:
+                grid.index = grid.index.strftime('%Y-%m-%d')
+                f4 = px.imshow(grid, text_auto='.0f', aspect='auto', color_continuous_scale='Blues',
+                               labels={'x': f'{cohort_period.title()}s since first activity', 'y': 'Cohort', 'color': cohort_metric})
+                f4.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font_color="white")
+                st.plotly_chart(f4, use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+# Once this page is rendered, precompute the other pages' results in the background
+# (published bundles have nothing left to compute)
+if not read_only:
+    prefetch_tasks = {task: compute for page, tasks in PAGE_TASKS.items() if page != nav
+                      for task, compute in tasks.items() if task not in PAGE_TASKS[nav]}
+    if 'qoe' in prefetch_tasks:
+        # Background engines slice the dataset's QoE sketches (built once per dataset)
+        ae.qoe = get_qoe(source_key, base)
+    # Exact results behind on-screen estimates are queued first
+    get_scheduler().prefetch(cache_key, ae, {**refining, **prefetch_tasks},
+                             session=st.session_state.session_id)
+    with st.sidebar:
+        prefetch_status(list(prefetch_tasks), list(refining))
@@ -0,0 +1,145 @@
+"""
+Headless batch report: computes the full insight set for many workbooks
+(or Parquet event stores) in parallel, one process per input.
+
+Usage:
+    python batch_report.py data/regional/*.xlsx --output-dir reports/ --parquet
+"""
+import os
+
+# One BLAS/OpenMP thread per worker process; parallelism comes from the pool.
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+import argparse
+import glob
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import duckdb
+import pandas as pd
+
+from etl import load_data
+from analytics import AnalyticsEngine
+from insights import compute_insights, to_jsonable
+
+
+def expand_inputs(inputs):
+    """
+    Files are taken as-is. Directories holding Parquet files are treated
+    as event stores; other directories are expanded to their .xlsx files.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            if glob.glob(os.path.join(item, '**', '*.parquet'), recursive=True):
+                paths.append(item)
+            else:
+                paths.extend(sorted(glob.glob(os.path.join(item, '*.xlsx'))))
+        else:
+            paths.append(item)
+    return paths
+
+
+def report_name(path):
+    return os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+
+
+def write_tables(insights, out_dir, name):
+    """Writes every tabular insight as <name>.<insight>.parquet (via DuckDB)."""
+    con = duckdb.connect(database=':memory:')
+    written = []
+    for key, value in insights.items():
+        if isinstance(value, pd.DataFrame) and not value.empty:
+            target = os.path.join(out_dir, f"{name}.{key}.parquet")
+            con.register('result_table', value)
+            con.execute(f"COPY result_table TO '{target}' (FORMAT PARQUET)")
+            con.unregister('result_table')
+            written.append(target)
+    con.close()
+    return written
+
+
+def run_report(path, out_dir, write_parquet=False, include_clusters=True):
+    """Worker: load, compute and write one input. Returns its timings."""
+    timings = {}
+    start = time.perf_counter()
+
+    if os.path.isdir(path):
+        ae = AnalyticsEngine.from_event_store(path, threads=1)
+    else:
+        data = load_data(path)
+        ae = AnalyticsEngine(data['dataset'], threads=1, profile=data['profile'])
+    timings['load_s'] = time.perf_counter() - start
+
+    t = time.perf_counter()
+    insights = compute_insights(ae, include_clusters=include_clusters)
+    timings['compute_s'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    name = report_name(path)
+    with open(os.path.join(out_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump({'source': path, 'insights': to_jsonable(insights)}, f, ensure_ascii=False, indent=2)
+    if write_parquet:
+        write_tables(insights, out_dir, name)
+    timings['write_s'] = time.perf_counter() - t
+    timings['total_s'] = time.perf_counter() - start
+
+    return {'source': path, 'report': name, 'status': 'ok', 'timings': timings}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute TVAnalytics insights for many datasets in parallel.")
+    parser.add_argument('inputs', nargs='+', help="Workbooks, event store directories, or directories of workbooks")
+    parser.add_argument('--output-dir', default='reports', help="Where JSON/Parquet results are written")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Process pool size (default: all cores)")
+    parser.add_argument('--parquet', action='store_true', help="Also write tabular insights as Parquet")
+    parser.add_argument('--no-clusters', action='store_true', help="Skip K-Means clustering")
+    args = parser.parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        parser.error("No input files found.")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    workers = max(1, min(args.workers, len(paths)))
+    print(f"Processing {len(paths)} input(s) with {workers} worker(s)...")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_report, p, args.output_dir, args.parquet, not args.no_clusters): p for p in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+                t = result['timings']
+                print(f"  OK   {path}: load {t['load_s']:.2f}s | compute {t['compute_s']:.2f}s | "
+                      f"write {t['write_s']:.2f}s | total {t['total_s']:.2f}s")
+            except Exception as e:
+                result = {'source': path, 'status': 'error', 'error': str(e)}
+                print(f"  FAIL {path}: {e}")
+            results.append(result)
+    elapsed = time.perf_counter() - start
+
+    busy = sum(r['timings']['total_s'] for r in results if r['status'] == 'ok')
+    summary = {
+        'inputs': len(paths),
+        'succeeded': sum(r['status'] == 'ok' for r in results),
+        'workers': workers,
+        'wall_s': elapsed,
+        'throughput_files_per_s': len(paths) / elapsed if elapsed else None,
+        # Busy time / (wall time * workers): 1.0 means every worker was saturated
+        'pool_utilization': busy / (elapsed * workers) if elapsed else None,
+        'results': results,
+    }
+    with open(os.path.join(args.output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Done in {elapsed:.2f}s ({summary['throughput_files_per_s']:.2f} files/s, "
+          f"pool utilization {summary['pool_utilization']:.0%}).")
+    return 0 if summary['succeeded'] == len(paths) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
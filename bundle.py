@@ -0,0 +1,259 @@
+"""
+Published dashboard bundles: every page result of one view (KPIs, the seven
+insights, SAI, trend, cluster summary) plus cube aggregates, computed once
+into a small versioned zip. The app opens a bundle read-only (TVA_BUNDLE)
+without loading or querying the raw events.
+
+    python bundle.py autogravity_dataset.xlsx 2025-06.tva.zip --date-from 2025-06-01 --date-to 2025-06-30
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import zipfile
+
+import pandas as pd
+
+from insights import compute_insights, to_jsonable
+
+BUNDLE_FORMAT = 'tvanalytics-bundle'
+BUNDLE_VERSION = 1
+# Cube aggregates: every combination of these values and roll-ups
+CUBE_DIMENSIONS = ('region', 'device', 'genre')
+# Daily trend per combination of these values and roll-ups: all of the cube's,
+# so every filter a BundleView accepts also applies to the trend
+TREND_DIMENSIONS = CUBE_DIMENSIONS
+
+
+def _grouped(ae, dims, measures, day=False):
+    """Measures of video_events GROUP BY [day,] CUBE(dims), with all_<dim> roll-up flags."""
+    dims = [d for d in dims if d in ae.columns]
+    if not dims:
+        return pd.DataFrame()
+    cols = ', '.join(f'"{d}"' for d in dims)
+    flags = ', '.join(f'GROUPING("{d}") = 1 AS "all_{d}"' for d in dims)
+    day_col = "DATE_TRUNC('day', timestamp) AS day, " if day else ""
+    return ae.con.execute(f"""
+    SELECT {day_col}{cols}, {flags}, {measures}
+    FROM video_events
+    GROUP BY {'day, ' if day else ''}CUBE ({cols})
+    """).df()
+
+
+def compute_cube(ae):
+    """Region x device x genre cube: events, watch time, completion and distinct viewers per cell."""
+    return _grouped(ae, CUBE_DIMENSIONS, """
+        COUNT(*) AS events,
+        SUM(watch_time_minutes) AS total_watch_time,
+        COUNT(watch_time_minutes) AS watch_count,
+        SUM(completion_rate) AS completion_sum,
+        COUNT(completion_rate) AS completion_count,
+        COUNT(DISTINCT user_id) AS unique_viewers""")
+
+
+def compute_trend_cube(ae):
+    """Daily screentime per region x device cell."""
+    if 'timestamp' not in ae.columns:
+        return pd.DataFrame()
+    return _grouped(ae, TREND_DIMENSIONS, "SUM(watch_time_minutes) AS total_screentime", day=True)
+
+
+def build_bundle(ae, path, include_clusters=True, source=None):
+    """
+    Computes the engine's page results and writes them to `path`:
+        manifest.json   format, version, source, view filters, columns, tables
+        insights.json   scalar insights (KPIs, leaders, device ratio, recurrence)
+        tables/*.json   one pandas 'table' JSON per tabular result (dtypes kept)
+    The zip is written next to `path` and renamed into place.
+    """
+    insights = compute_insights(ae, include_clusters=include_clusters)
+    tables = {k: v for k, v in insights.items() if isinstance(v, pd.DataFrame)}
+    values = {k: v for k, v in insights.items() if not isinstance(v, pd.DataFrame)}
+    tables['cube'] = compute_cube(ae)
+    tables['trend_cube'] = compute_trend_cube(ae)
+
+    bounds = ae.get_time_bounds()
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': BUNDLE_VERSION,
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'source': source,
+        'filters': ae.filters,
+        'date_range': ae.date_range,
+        'time_bounds': bounds,
+        'columns': ae.columns,
+        'tables': {name: len(table) for name, table in tables.items()},
+    }
+
+    partial = f"{path}.tmp-{os.getpid()}"
+    with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('manifest.json', json.dumps(to_jsonable(manifest), ensure_ascii=False, indent=2))
+        z.writestr('insights.json', json.dumps(to_jsonable(values), ensure_ascii=False))
+        for name, table in tables.items():
+            z.writestr(f'tables/{name}.json', table.to_json(orient='table', index=False, date_format='iso'))
+    os.replace(partial, path)
+    return manifest
+
+
+class Bundle:
+    """A published bundle loaded in memory: manifest, insights and tables."""
+
+    def __init__(self, manifest, insights, tables):
+        self.manifest = manifest
+        self.insights = insights
+        self.tables = tables
+
+    @classmethod
+    def load(cls, path):
+        with zipfile.ZipFile(path) as z:
+            manifest = json.loads(z.read('manifest.json'))
+            if manifest.get('format') != BUNDLE_FORMAT:
+                raise ValueError(f"{path} is not a TVAnalytics bundle.")
+            if manifest.get('version', 0) > BUNDLE_VERSION:
+                raise ValueError(f"Bundle version {manifest['version']} is newer than this app supports "
+                                 f"({BUNDLE_VERSION}).")
+            insights = json.loads(z.read('insights.json'))
+            tables = {name: pd.read_json(io.StringIO(z.read(f'tables/{name}.json').decode('utf-8')), orient='table')
+                      for name in manifest['tables']}
+        return cls(manifest, insights, tables)
+
+    def view(self, filters=None):
+        return BundleView(self, filters)
+
+
+class BundleView:
+    """
+    Read-only stand-in for AnalyticsEngine over a bundle, for the page
+    computations of app.py. KPIs, region/genre breakdowns and the trend
+    honour region/device/genre filters through the cube tables; the device
+    ratio, recurrence, top titles, SAI and clusters are those of the whole
+    published view.
+    """
+
+    def __init__(self, bundle, filters=None):
+        self.bundle = bundle
+        self.filters = {k: v for k, v in (filters or {}).items() if v not in (None, 'All')}
+        self.date_range = None
+        self.columns = list(bundle.manifest['columns'])
+        self.profile = None
+        self.skipped_rows = 0
+        for col, value in self.filters.items():
+            if col not in CUBE_DIMENSIONS or isinstance(value, (list, tuple, set)):
+                raise ValueError(f"Bundles can only filter one value of {', '.join(CUBE_DIMENSIONS)} (got {col}).")
+
+    def filtered(self, filters=None, date_range=None, threads=None):
+        if date_range:
+            raise ValueError("Bundles cannot be re-filtered by date.")
+        return BundleView(self.bundle, filters)
+
+    def _cells(self, table, dims, breakdown=None):
+        """Rows of a cube table for the filters: one per `breakdown` value, other dims rolled up."""
+        cube = self.bundle.tables[table]
+        if cube.empty:
+            return cube
+        mask = pd.Series(True, index=cube.index)
+        for dim in dims:
+            if dim not in cube.columns:
+                continue
+            if dim in self.filters:
+                mask &= ~cube[f'all_{dim}'] & (cube[dim] == self.filters[dim])
+            elif dim == breakdown:
+                mask &= ~cube[f'all_{dim}']
+            else:
+                mask &= cube[f'all_{dim}']
+        return cube[mask]
+
+    def get_distinct_values(self, column):
+        cube = self.bundle.tables['cube']
+        if column not in cube.columns:
+            return []
+        return sorted(cube.loc[~cube[f'all_{column}'], column].dropna().unique().tolist())
+
+    def get_time_bounds(self):
+        bounds = self.bundle.manifest.get('time_bounds')
+        return (pd.Timestamp(bounds[0]), pd.Timestamp(bounds[1])) if bounds else None
+
+    def get_kpis(self):
+        cells = self._cells('cube', CUBE_DIMENSIONS)
+        if cells.empty:
+            return {'total_screentime': float('nan'), 'active_customers': 0,
+                    'avg_completion_pct': float('nan'), 'avg_watch_time': float('nan')}
+        cell = cells.iloc[0]
+        return {
+            'total_screentime': float(cell['total_watch_time']),
+            'active_customers': int(cell['unique_viewers']),
+            'avg_completion_pct': float(cell['completion_sum'] / cell['completion_count'] * 100) if cell['completion_count'] else float('nan'),
+            'avg_watch_time': float(cell['total_watch_time'] / cell['watch_count']) if cell['watch_count'] else float('nan'),
+        }
+
+    def _breakdown(self, dimension):
+        cells = self._cells('cube', CUBE_DIMENSIONS, breakdown=dimension).copy()
+        cells['avg_watch_time'] = cells['total_watch_time'] / cells['watch_count'].where(cells['watch_count'] > 0)
+        return cells.sort_values('total_watch_time', ascending=False).reset_index(drop=True)
+
+    def get_geographic_stats(self):
+        if 'region' not in self.bundle.tables['cube'].columns:
+            return pd.DataFrame()
+        return self._breakdown('region')[['region', 'events', 'total_watch_time']]
+
+    def get_content_intelligence(self):
+        """Only top_genres is published; format and language tables are empty."""
+        top = self._breakdown('genre')[['genre', 'unique_viewers', 'total_watch_time', 'avg_watch_time']]
+        return {'top_genres': top, 'format_efficiency': pd.DataFrame(), 'language_preference': pd.DataFrame()}
+
+    def get_time_series(self):
+        cells = self._cells('trend_cube', TREND_DIMENSIONS)
+        if cells.empty:
+            return pd.DataFrame(columns=['day', 'total_screentime'])
+        return cells[['day', 'total_screentime']].sort_values('day').reset_index(drop=True)
+
+    # --- Published view only ---
+
+    def get_device_ratio(self):
+        return self.bundle.insights.get('device_ratio')
+
+    def get_recurrence_metrics(self):
+        return self.bundle.insights.get('recurrence') or {'avg_recurrence_days': 0.0, 'unique_dates_count': 0}
+
+    def get_top_content_ranking(self, k=None):
+        ranking = self.bundle.tables.get('top_titles', pd.DataFrame())
+        if ranking.empty:
+            return pd.Series(dtype='float64')
+        ranking = ranking.set_index(ranking.columns[0]).iloc[:, 0]
+        return ranking.head(k) if k else ranking
+
+    def get_sai(self, segment_col='segment', genre_col='genre'):
+        sai = self.bundle.tables.get('sai', pd.DataFrame())
+        return sai.set_index(sai.columns[0]).rename_axis(columns=genre_col) if not sai.empty else sai
+
+    def get_cluster_summary(self):
+        return self.bundle.tables.get('clusters', pd.DataFrame())
+
+
+if __name__ == "__main__":
+    from etl import load_data
+    from analytics import AnalyticsEngine
+
+    parser = argparse.ArgumentParser(description="Publish a read-only TVAnalytics dashboard bundle.")
+    parser.add_argument('source', help="Excel workbook or Parquet event store directory")
+    parser.add_argument('output', help="Bundle file, e.g. 2025-06.tva.zip")
+    parser.add_argument('--region')
+    parser.add_argument('--device')
+    parser.add_argument('--date-from', help="First day of the published view (YYYY-MM-DD)")
+    parser.add_argument('--date-to', help="Last day of the published view (YYYY-MM-DD)")
+    parser.add_argument('--no-clusters', action='store_true', help="Skip the K-Means cluster summary")
+    args = parser.parse_args()
+
+    filters = {'region': args.region, 'device': args.device}
+    date_range = (args.date_from, args.date_to) if args.date_from and args.date_to else None
+    if os.path.isdir(args.source):
+        engine = AnalyticsEngine.from_event_store(args.source, filters=filters, date_range=date_range)
+    else:
+        data = load_data(args.source)
+        engine = AnalyticsEngine(data['dataset'], filters=filters, date_range=date_range, profile=data['profile'])
+
+    manifest = build_bundle(engine, args.output, include_clusters=not args.no_clusters, source=args.source)
+    print(f"Bundle v{manifest['version']} written to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB)")
+    for name, rows in manifest['tables'].items():
+        print(f"  {name}: {rows:,} rows")
@@ -0,0 +1,104 @@
+"""
+Chart data reduction: whatever the dataset size, the frames handed to
+Plotly/Streamlit charts stay below fixed caps.
+"""
+import numpy as np
+import pandas as pd
+
+# Payload caps per chart
+MAX_POINTS = 5_000
+MAX_BINS = 80
+MAX_SERIES_POINTS = 1_000
+
+
+def lttb(x, y, threshold=MAX_SERIES_POINTS):
+    """
+    Largest-Triangle-Three-Buckets downsampling (Steinarsson). Keeps the
+    first and last points and, per bucket, the point forming the largest
+    triangle with the previous pick and the next bucket's average, which
+    preserves peaks and troughs. Returns the indices to keep.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        keep[i + 1] = previous
+    return keep
+
+
+def downsample_series(df, x, y, threshold=MAX_SERIES_POINTS):
+    """LTTB on a frame sorted by x (datetimes allowed); returns at most `threshold` rows."""
+    if len(df) <= threshold:
+        return df
+    xs = df[x]
+    xs = xs.astype('int64') if pd.api.types.is_datetime64_any_dtype(xs) else xs
+    y_values = df[y].astype('float64').fillna(0)
+    return df.iloc[lttb(xs.to_numpy(), y_values.to_numpy(), threshold)]
+
+
+def binned_density(con, source, x, y, color=None, bins=MAX_BINS):
+    """
+    2D histogram of a table/view computed in DuckDB: one row per non-empty
+    bin (at most bins x bins) with the bin centre, its count and, when
+    `color` is given, the most frequent value of that column in the bin.
+    """
+    color_sql = f', MODE("{color}") AS "{color}"' if color else ""
+    return con.execute(f"""
+    WITH bounds AS (
+        SELECT MIN("{x}") AS lx, MAX("{x}") AS hx, MIN("{y}") AS ly, MAX("{y}") AS hy
+        FROM {source}
+    ), binned AS (
+        SELECT
+            LEAST(COALESCE(FLOOR(("{x}" - lx) / NULLIF(hx - lx, 0) * {bins}), 0), {bins - 1}) AS bin_x,
+            LEAST(COALESCE(FLOOR(("{y}" - ly) / NULLIF(hy - ly, 0) * {bins}), 0), {bins - 1}) AS bin_y
+            {f', "{color}"' if color else ""}
+        FROM {source}, bounds
+        WHERE "{x}" IS NOT NULL AND "{y}" IS NOT NULL
+    )
+    SELECT
+        ANY_VALUE(lx) + (bin_x + 0.5) * (ANY_VALUE(hx) - ANY_VALUE(lx)) / {bins} AS "{x}",
+        ANY_VALUE(ly) + (bin_y + 0.5) * (ANY_VALUE(hy) - ANY_VALUE(ly)) / {bins} AS "{y}",
+        COUNT(*) AS count
+        {color_sql}
+    FROM binned, bounds
+    GROUP BY bin_x, bin_y
+    """).df()
+
+
+def stratified_sample(con, source, columns, by, n=MAX_POINTS, min_per_stratum=50, seed=42):
+    """
+    Sample of about `n` rows of a table/view with every `by` value
+    represented: each stratum gets a share proportional to its size (at
+    least `min_per_stratum`). Rows are picked by a seeded hash in one
+    filtering scan plus a small top-n, never by sorting the whole source.
+    """
+    cols = ', '.join(f's."{c}"' for c in dict.fromkeys(list(columns) + [by]))
+    hash_args = ', '.join(f's."{c}"' for c in columns)
+    row_hash = f"hash({hash_args}, {int(seed)})"
+    return con.execute(f"""
+    WITH counts AS (
+        SELECT "{by}" AS stratum, COUNT(*) AS rows FROM {source} GROUP BY 1
+    ), quotas AS (
+        SELECT stratum, rows,
+            LEAST(rows, GREATEST({int(min_per_stratum)}, CEIL({int(n)} * rows / SUM(rows) OVER ()))) AS quota
+        FROM counts
+    )
+    SELECT {cols}
+    FROM {source} s JOIN quotas q ON s."{by}" IS NOT DISTINCT FROM q.stratum
+    -- Keep ~1.2x the quota by hash, then cut each stratum to its quota
+    WHERE {row_hash} % 1000003 < 1000003 * LEAST(1.0, 1.2 * q.quota / q.rows)
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY s."{by}" ORDER BY {row_hash}) <= q.quota
+    """).df()
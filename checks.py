@@ -0,0 +1,66 @@
+"""
+Shared harness of the verify_*.py scripts: one OK/FAIL line per check and
+a closing summary whose return value is the script's exit code.
+"""
+import numpy as np
+import pandas as pd
+
+
+def same(a, b, rtol=1e-9):
+    """
+    Whether two engine results agree: DataFrames and Series regardless of
+    row order, dicts key by key, floats within `rtol`, NaN equal to NaN.
+    """
+    if isinstance(a, pd.DataFrame) or isinstance(b, pd.DataFrame):
+        if not (isinstance(a, pd.DataFrame) and isinstance(b, pd.DataFrame)):
+            return False
+        if sorted(map(str, a.columns)) != sorted(map(str, b.columns)) or len(a) != len(b):
+            return False
+        b = b[list(a.columns)]
+        if a.empty:
+            return True
+        order = list(a.columns)
+        a = a.sort_values(order, kind='stable').reset_index(drop=True)
+        b = b.sort_values(order, kind='stable').reset_index(drop=True)
+        return all(same(a[c].tolist(), b[c].tolist(), rtol) for c in order)
+    if isinstance(a, pd.Series) or isinstance(b, pd.Series):
+        return same(pd.DataFrame({'value': a}).reset_index(), pd.DataFrame({'value': b}).reset_index(), rtol)
+    if isinstance(a, dict) or isinstance(b, dict):
+        return (isinstance(a, dict) and isinstance(b, dict) and set(a) == set(b)
+                and all(same(a[k], b[k], rtol) for k in a))
+    if isinstance(a, (list, tuple)) or isinstance(b, (list, tuple)):
+        return (isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)) and len(a) == len(b)
+                and all(same(x, y, rtol) for x, y in zip(a, b)))
+    if a is None or b is None or (not isinstance(a, str) and pd.isna(a)):
+        return (a is None or pd.isna(a)) and (b is None or (not isinstance(b, str) and pd.isna(b)))
+    if isinstance(a, (int, float, np.number)) and isinstance(b, (int, float, np.number)):
+        return bool(np.isclose(float(a), float(b), rtol=rtol, atol=0))
+    return a == b
+
+
+class Checks:
+    """
+    Call the instance once per check, then return summary(...) from main():
+
+        check = Checks()
+        check("totals equal pandas", ok, f"{rows:,} rows")
+        return check.summary("Totals match.", "totals")
+    """
+
+    def __init__(self, width=50):
+        self.width = width
+        self.failures = []
+
+    def __call__(self, name, ok, detail=""):
+        print(f"{'OK' if ok else 'FAIL':4} {name:{self.width}} {detail}".rstrip())
+        if not ok:
+            self.failures.append(name)
+        return bool(ok)
+
+    def summary(self, success, subject):
+        """Prints the closing line; 0 when every check passed, else 1."""
+        if self.failures:
+            print(f"\n{len(self.failures)} {subject} check(s) failed.")
+            return 1
+        print(f"\n{success}")
+        return 0
@@ -0,0 +1,167 @@
+import pandas as pd
+
+# Cohort granularities (DuckDB date parts)
+COHORT_PERIODS = ('week', 'month')
+METRICS = ('retention', 'active_users', 'screentime')
+
+
+class CohortMatrix:
+    """
+    Acquisition cohort x periods-since-first-activity grid.
+
+    Each user_id joins the cohort of its first active week/month; `by`
+    columns (e.g. region, device, segment) are taken from that first
+    activity, so cohorts can be sliced by acquisition attributes. First
+    activity can come from a wider source than the counted activity (the
+    engine's unfiltered events), so filters never move users between cohorts.
+
+    State is two compact tables: `users` (user_id -> cohort + attributes) and
+    `cells` (cohort, attributes, period_number -> active users, screentime).
+    The grid is built in one DuckDB pass; new periods are folded in with
+    update() without rescanning history, and matrix() slices/pivots the
+    cells without touching events at all.
+    """
+
+    def __init__(self, period='month', by=None):
+        if period not in COHORT_PERIODS:
+            raise ValueError(f"Unsupported cohort period '{period}' (use {', '.join(COHORT_PERIODS)}).")
+        self.period = period
+        self.by = list(by or [])
+        self.users = None
+        self.cells = None
+        # Last period already counted; updates must start after it
+        self.watermark = None
+
+    @classmethod
+    def from_engine(cls, ae, period='month', by=None):
+        """
+        Builds the grid from the engine's filtered events; cohorts and
+        acquisition attributes come from the unfiltered events.
+        """
+        by = [c for c in (by or []) if c in ae.columns]
+        matrix = cls(period, by)
+        matrix.update(ae.con, acquisition='events_source')
+        return matrix
+
+    def update(self, con, source='video_events', acquisition=None):
+        """
+        Folds events from `source` (a table/view on `con`) into the grid.
+        Known users keep their cohort and attributes; users seen for the
+        first time join the cohort of their first event in `acquisition`
+        (default: `source`). Batches must only hold periods after the
+        watermark, since active users are counted once per period.
+        """
+        acquisition = acquisition or source
+        attrs = "".join(f', arg_min("{c}", timestamp) AS "{c}"' for c in self.by)
+        if self.users is None:
+            tagged = f"""
+            SELECT a.user_id, a.period, a.screentime, f.cohort
+                {"".join(f', f."{c}"' for c in self.by)},
+                TRUE AS is_new
+            FROM activity a JOIN first_seen f ON a.user_id = f.user_id"""
+        else:
+            con.register('cohort_users', self.users)
+            tagged = f"""
+            SELECT a.user_id, a.period, a.screentime,
+                CASE WHEN u.user_id IS NULL THEN f.cohort ELSE u.cohort END AS cohort
+                {"".join(f', CASE WHEN u.user_id IS NULL THEN f."{c}" ELSE u."{c}" END AS "{c}"' for c in self.by)},
+                u.user_id IS NULL AS is_new
+            FROM activity a
+            LEFT JOIN cohort_users u ON a.user_id = u.user_id
+            LEFT JOIN first_seen f ON a.user_id = f.user_id"""
+
+        con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE cohort_batch AS
+        WITH activity AS (
+            SELECT
+                user_id,
+                DATE_TRUNC('{self.period}', timestamp) AS period,
+                SUM(watch_time_minutes) AS screentime
+            FROM {source}
+            WHERE user_id IS NOT NULL AND timestamp IS NOT NULL
+            GROUP BY user_id, period
+        ), first_seen AS (
+            SELECT
+                user_id,
+                DATE_TRUNC('{self.period}', MIN(timestamp)) AS cohort
+                {attrs}
+            FROM {acquisition}
+            WHERE user_id IN (SELECT user_id FROM activity) AND timestamp IS NOT NULL
+            GROUP BY user_id
+        ){tagged}
+        """)
+        try:
+            first, last = con.execute("SELECT MIN(period), MAX(period) FROM cohort_batch").fetchone()
+            if first is None:
+                return self
+            if self.watermark is not None and first <= self.watermark:
+                raise ValueError(f"Batch starts at {first:%Y-%m-%d}, already counted up to {self.watermark:%Y-%m-%d}; "
+                                 "only append periods after the watermark.")
+
+            keys = "".join(f', "{c}"' for c in self.by)
+            new_users = con.execute(f"SELECT DISTINCT user_id, cohort{keys} FROM cohort_batch WHERE is_new").df()
+            cells = con.execute(f"""
+            SELECT
+                cohort{keys},
+                DATEDIFF('{self.period}', cohort, period) AS period_number,
+                COUNT(*) AS active_users,
+                SUM(screentime) AS screentime
+            FROM cohort_batch
+            GROUP BY ALL
+            """).df()
+        finally:
+            con.execute("DROP TABLE IF EXISTS cohort_batch")
+            if self.users is not None:
+                con.unregister('cohort_users')
+
+        self.users = new_users if self.users is None else pd.concat([self.users, new_users], ignore_index=True)
+        if self.cells is not None:
+            cells = pd.concat([self.cells, cells], ignore_index=True)
+        group = ['cohort'] + self.by + ['period_number']
+        # dropna=False keeps users whose acquisition attribute is missing
+        self.cells = cells.groupby(group, dropna=False, as_index=False)[['active_users', 'screentime']].sum()
+        self.watermark = pd.Timestamp(last)
+        return self
+
+    def values(self, column):
+        """Acquisition attribute values present in the grid (for slicers)."""
+        if self.cells is None or column not in self.by:
+            return []
+        return sorted(self.cells[column].dropna().unique().tolist(), key=str)
+
+    def _slice(self, frame, slices):
+        for column, value in slices.items():
+            if value in (None, 'All'):
+                continue
+            if column not in self.by:
+                raise KeyError(f"Cohorts are not sliceable by '{column}' (built with by={self.by})")
+            frame = frame[frame[column] == value]
+        return frame
+
+    def matrix(self, metric='retention', max_periods=24, **slices):
+        """
+        Cohort x period_number grid. slices filter acquisition attributes,
+        e.g. region='North'. metric: 'retention' (% of the cohort's users
+        active), 'active_users' or 'screentime' (minutes).
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported cohort metric '{metric}' (use {', '.join(METRICS)}).")
+        if self.cells is None:
+            return pd.DataFrame()
+
+        cells = self._slice(self.cells, slices)
+        value_col = 'screentime' if metric == 'screentime' else 'active_users'
+        grid = (cells[cells['period_number'] < max_periods]
+                .groupby(['cohort', 'period_number'])[value_col].sum()
+                .unstack('period_number'))
+        if metric == 'retention' and not grid.empty:
+            # Under filters a user may be inactive in their cohort period, so
+            # period 0 is not always the cohort size
+            grid = grid.div(self.cohort_sizes(**slices).reindex(grid.index), axis=0) * 100
+        return grid
+
+    def cohort_sizes(self, **slices):
+        """Users per cohort (those with activity in the grid)."""
+        if self.users is None:
+            return pd.Series(dtype='int64')
+        return self._slice(self.users, slices).groupby('cohort').size()
@@ -1,5 +1,6 @@
 import pandas as pd
 import duckdb
+from profiling import profile_dataframe, count_coercion_failures
 
 def normalize_sheet_name(sheet_names, target):
     """Finds the actual sheet name doing a case-insensitive match."""
@@ -67,6 +68,8 @@ def load_data(file):
     """
     Loads the Excel file. 
     Returns a dictionary of DataFrames: {'instrucciones': df, 'dataset': df}
+    plus 'profile': the DatasetProfile (column stats, zone maps, data quality)
+    gathered while cleaning the dataset.
     """
     try:
         # Load sheets. If file is None, returns None.
@@ -99,9 +102,12 @@ def load_data(file):
             # Smart Cleaning & Mapping
             df = normalize_columns(df)
             
-            # Type Enforcement
+            # Type Enforcement (recording how many values each coercion drops)
+            coercion_failures = {}
             if 'timestamp' in df.columns:
-                df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+                parsed = pd.to_datetime(df['timestamp'], errors='coerce')
+                coercion_failures['timestamp'] = count_coercion_failures(df['timestamp'], parsed)
+                df['timestamp'] = parsed
             
             if 'genre' in df.columns:
                 df['genre'] = df['genre'].astype(str).str.strip().str.title()
@@ -111,8 +117,11 @@ def load_data(file):
                  if 'watch_time_minutes' in df.columns and 'content_duration_minutes' in df.columns:
                      # print("Calculating 'completion_rate' from Watch Time and Content Duration...")
                      # Avoid division by zero
-                     df['content_duration_minutes'] = pd.to_numeric(df['content_duration_minutes'], errors='coerce').replace(0, pd.NA)
-                     df['watch_time_minutes'] = pd.to_numeric(df['watch_time_minutes'], errors='coerce')
+                     for col in ['content_duration_minutes', 'watch_time_minutes']:
+                         numeric = pd.to_numeric(df[col], errors='coerce')
+                         coercion_failures[col] = count_coercion_failures(df[col], numeric)
+                         df[col] = numeric
+                     df['content_duration_minutes'] = df['content_duration_minutes'].replace(0, pd.NA)
                      
                      df['completion_rate'] = df['watch_time_minutes'] / df['content_duration_minutes']
                      # Fill NaNs (div by zero or missing) with 0
@@ -123,9 +132,13 @@ def load_data(file):
             # Numeric conversion
             for col in ['watch_time_minutes', 'completion_rate', 'content_duration_minutes']:
                 if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                    numeric = pd.to_numeric(df[col], errors='coerce')
+                    coercion_failures[col] = coercion_failures.get(col, 0) + count_coercion_failures(df[col], numeric)
+                    df[col] = numeric.fillna(0)
 
             data['dataset'] = df
+            # Single profiling pass: stats the engine can reuse instead of rescanning
+            data['profile'] = profile_dataframe(df, coercion_failures)
         else:
              raise ValueError("Could not find a sheet named 'Dataset', 'Datos', or similar.")
             
@@ -0,0 +1,176 @@
+"""
+Export of analysis results: one sheet/file per insight plus the filtered
+events. Large sheets are streamed from DuckDB in batches, so exporting
+millions of (clustered) events never materializes them in pandas.
+
+    python export.py autogravity_dataset.xlsx report.xlsx --region North
+    python export.py autogravity_dataset.xlsx report_dir/ --format parquet
+"""
+import argparse
+import os
+
+import duckdb
+import pandas as pd
+
+from insights import compute_insights, get_cluster_summary
+
+# Rows per worksheet (Excel limit, header row included)
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def _report_tables(ae, include_clusters):
+    """Small insight tables (already aggregated) plus the streamed queries."""
+    insights = compute_insights(ae, include_clusters=False)
+
+    summary = {f'kpi_{k}': v for k, v in insights['kpis'].items()}
+    for key in ('dominant_genre', 'device_ratio', 'regional_leader', 'top_title'):
+        summary[key] = insights[key]
+    for k, v in (insights['recurrence'] or {}).items():
+        summary[k] = v
+    summary_df = pd.DataFrame({'metric': list(summary), 'value': [str(v) for v in summary.values()]})
+
+    tables = {
+        'Summary': summary_df,
+        'Trend': insights['trend'],
+        'SAI': insights['sai'],
+    }
+    if include_clusters:
+        # Streamed K-Means: the events are never materialized in pandas
+        tables['Clusters'] = get_cluster_summary(ae, stream=True)
+
+    target = ae._content_target()
+    queries = {
+        'Ranking': f'''
+            SELECT "{target}", SUM(watch_time_minutes) AS total_watch_time
+            FROM video_events GROUP BY 1 ORDER BY 2 DESC''',
+        'Events': "SELECT * FROM video_events",
+    }
+    if include_clusters and tables['Clusters'] is not None and not tables['Clusters'].empty:
+        queries['Cluster Assignments'] = "SELECT * FROM clustered_events"
+    return tables, queries
+
+
+def _write_excel_rows(ws, start_row, frame):
+    """Writes a chunk row by row (constant_memory needs sequential rows)."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    for offset, row in enumerate(frame.itertuples(index=False, name=None)):
+        ws.write_row(start_row + offset, 0, row)
+    return start_row + len(frame)
+
+
+def _export_excel(ae, path, tables, queries, batch_vectors):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'remove_timezone': True,
+    })
+    header = workbook.add_format({'bold': True})
+    written = {}
+
+    def new_sheet(name, columns):
+        ws = workbook.add_worksheet(name[:31])
+        ws.write_row(0, 0, [str(c) for c in columns], header)
+        return ws
+
+    for name, frame in tables.items():
+        if frame is None or frame.empty:
+            continue
+        ws = new_sheet(name, frame.columns)
+        _write_excel_rows(ws, 1, frame)
+        written[name] = len(frame)
+
+    for name, query in queries.items():
+        result = ae.con.execute(query)
+        columns = [d[0] for d in result.description]
+        part, rows, total = 1, 1, 0
+        ws = new_sheet(name, columns)
+        while True:
+            chunk = result.fetch_df_chunk(batch_vectors)
+            if chunk.empty:
+                break
+            # Roll over to '<name> (2)', ... when a sheet reaches Excel's row limit
+            while not chunk.empty:
+                room = EXCEL_MAX_ROWS - rows
+                if room == 0:
+                    part += 1
+                    ws = new_sheet(f"{name[:26]} ({part})", columns)
+                    rows = 1
+                    continue
+                rows = _write_excel_rows(ws, rows, chunk.iloc[:room])
+                total += min(room, len(chunk))
+                chunk = chunk.iloc[room:]
+        written[name] = total
+
+    workbook.close()
+    return written
+
+
+def _export_files(ae, path, tables, queries, fmt):
+    """One Parquet/CSV file per insight; queries stream inside DuckDB via COPY."""
+    os.makedirs(path, exist_ok=True)
+    options = "FORMAT PARQUET" if fmt == 'parquet' else "HEADER, DELIMITER ','"
+    written = {}
+
+    def target(name):
+        return os.path.join(path, f"{name.lower().replace(' ', '_')}.{fmt}")
+
+    for name, frame in tables.items():
+        if frame is None or frame.empty:
+            continue
+        con = duckdb.connect(database=':memory:')
+        con.register('result_table', frame)
+        con.execute(f"COPY result_table TO '{target(name)}' ({options})")
+        con.close()
+        written[name] = len(frame)
+
+    for name, query in queries.items():
+        # COPY returns the number of rows it wrote
+        written[name] = ae.con.execute(f"COPY ({query}) TO '{target(name)}' ({options})").fetchone()[0]
+    return written
+
+
+def export_report(ae, path, fmt=None, include_events=True, include_clusters=True, batch_vectors=16):
+    """
+    Writes the multi-sheet report for an engine's current filters.
+    fmt: 'xlsx' (single workbook, xlsxwriter constant-memory mode), or
+    'parquet' / 'csv' (a directory with one file per insight, better for
+    large outputs). Inferred from the path when omitted.
+    Returns {sheet name: rows written}.
+    """
+    fmt = fmt or ('xlsx' if path.lower().endswith('.xlsx') else 'parquet')
+    tables, queries = _report_tables(ae, include_clusters)
+    if not include_events:
+        queries.pop('Events', None)
+        queries.pop('Cluster Assignments', None)
+
+    if fmt == 'xlsx':
+        return _export_excel(ae, path, tables, queries, batch_vectors)
+    if fmt in ('parquet', 'csv'):
+        return _export_files(ae, path, tables, queries, fmt)
+    raise ValueError(f"Unsupported export format '{fmt}' (use xlsx, parquet or csv).")
+
+
+if __name__ == "__main__":
+    from etl import load_data
+    from analytics import AnalyticsEngine
+
+    parser = argparse.ArgumentParser(description="Export TVAnalytics results.")
+    parser.add_argument('source', help="Excel workbook or Parquet event store directory")
+    parser.add_argument('output', help="report.xlsx, or a directory for parquet/csv")
+    parser.add_argument('--format', choices=['xlsx', 'parquet', 'csv'])
+    parser.add_argument('--region')
+    parser.add_argument('--device')
+    parser.add_argument('--no-events', action='store_true', help="Only export the insight sheets")
+    args = parser.parse_args()
+
+    filters = {'region': args.region, 'device': args.device}
+    if os.path.isdir(args.source):
+        engine = AnalyticsEngine.from_event_store(args.source, filters=filters)
+    else:
+        data = load_data(args.source)
+        engine = AnalyticsEngine(data['dataset'], filters=filters, profile=data['profile'])
+
+    for sheet, rows in export_report(engine, args.output, args.format, include_events=not args.no_events).items():
+        print(f"{sheet}: {rows:,} rows")
@@ -0,0 +1,75 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+
+def get_cluster_summary(ae, stream=None):
+    """
+    Size and mean profile of each K-Means tribe, for both in-memory
+    (DataFrame) and out-of-core (DuckDB relation) clustering results.
+    stream: passed to perform_clustering (True keeps memory bounded).
+    """
+    c_df, features = ae.perform_clustering(stream=stream)
+    if not features:
+        return pd.DataFrame()
+
+    if isinstance(c_df, pd.DataFrame):
+        summary = c_df.groupby('cluster')[features].mean()
+        summary.insert(0, 'events', c_df.groupby('cluster').size())
+        return summary.reset_index()
+
+    means = ', '.join(f'AVG("{c}") AS "{c}"' for c in features)
+    return ae.con.execute(f"""
+    SELECT cluster, COUNT(*) AS events, {means}
+    FROM clustered_events GROUP BY cluster ORDER BY cluster
+    """).df()
+
+
+def compute_insights(ae, include_clusters=True):
+    """
+    The full Mission Control insight set (the 7 Master Questions plus SAI
+    and clusters) for one engine. Scalars are plain values; tabular
+    results are DataFrames (see to_jsonable for serialization).
+    """
+    kpis = ae.get_kpis()
+
+    top_genres = ae.get_content_intelligence()['top_genres']
+    geo_stats = ae.get_geographic_stats()
+    ranking = ae.get_top_content_ranking(k=3)
+    sai = ae.get_sai()
+
+    insights = {
+        'kpis': kpis,
+        'dominant_genre': top_genres.iloc[0]['genre'] if not top_genres.empty else None,
+        'device_ratio': ae.get_device_ratio() if 'device' in ae.columns else None,
+        'trend': ae.get_time_series() if 'timestamp' in ae.columns else pd.DataFrame(),
+        'regional_leader': geo_stats.iloc[0]['region'] if not geo_stats.empty else None,
+        'top_title': ranking.index[0] if not ranking.empty else None,
+        'top_titles': ranking.reset_index(),
+        'recurrence': ae.get_recurrence_metrics() if 'timestamp' in ae.columns else None,
+        'sai': sai.rename_axis(columns=None).reset_index() if not sai.empty else sai,
+    }
+    if include_clusters:
+        insights['clusters'] = get_cluster_summary(ae)
+    return insights
+
+
+def to_jsonable(value):
+    """Converts insight results (DataFrames, numpy scalars, timestamps) to JSON types."""
+    if isinstance(value, pd.DataFrame):
+        return [to_jsonable(row) for row in value.to_dict(orient='records')]
+    if isinstance(value, pd.Series):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, (pd.Timestamp, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return value
@@ -0,0 +1,128 @@
+"""
+Automatic choice of the K-Means cluster count.
+
+Candidate k values are fitted on a random sample in parallel waves across a
+process pool and scored with a sampled silhouette, Davies-Bouldin and the
+inertia elbow; the three criteria vote on k. Each score only needs the
+sample, so the cost does not grow with the number of events.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+
+def _score_k(sample, k, silhouette_size, random_state):
+    """Worker: fits one k on the sample and scores it."""
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import davies_bouldin_score, silhouette_score
+
+    start = time.perf_counter()
+    model = KMeans(n_clusters=k, random_state=random_state, n_init=3).fit(sample)
+    labels = model.labels_
+    return {
+        'k': k,
+        'inertia': float(model.inertia_),
+        'silhouette': float(silhouette_score(sample, labels, sample_size=min(silhouette_size, len(sample)),
+                                             random_state=random_state)),
+        'davies_bouldin': float(davies_bouldin_score(sample, labels)),
+        'fit_s': time.perf_counter() - start,
+    }
+
+
+def _elbow(scores):
+    """k farthest below the straight line from the first to the last inertia (kneedle)."""
+    if len(scores) < 3:
+        return int(scores.index[0])
+    k = scores.index.to_numpy(dtype='float64')
+    inertia = scores['inertia'].to_numpy()
+    x = (k - k[0]) / (k[-1] - k[0])
+    y = (inertia - inertia[-1]) / ((inertia[0] - inertia[-1]) or 1)
+    return int(k[np.argmax((1 - x) - y)])
+
+
+def _vote(scores, elbow_k):
+    """
+    k with the best summed rank: silhouette (higher is better),
+    Davies-Bouldin (lower is better) and distance to the elbow. Ties go to
+    the higher silhouette.
+    """
+    ranks = (scores['silhouette'].rank(ascending=False)
+             + scores['davies_bouldin'].rank()
+             + pd.Series(np.abs(scores.index - elbow_k), index=scores.index).rank())
+    best = ranks[ranks == ranks.min()].index
+    return int(scores.loc[best, 'silhouette'].idxmax())
+
+
+def select_k(X, k_values=range(2, 9), sample_size=20_000, silhouette_size=5_000,
+             time_budget=10.0, patience=2, max_workers=None, random_state=42):
+    """
+    Picks the cluster count for the (already scaled) rows of X.
+
+    k values are evaluated in waves of `max_workers` processes (default: all
+    cores; in-process with one). After each wave the search stops early once
+    the silhouette has not improved for `patience` consecutive k. Once
+    `time_budget` seconds have elapsed, fits not started yet are cancelled
+    and running ones are abandoned (at least one k is always scored).
+    Returns {'k': rank vote of silhouette, Davies-Bouldin and elbow (see
+             _vote), 'elbow_k', 'scores': DataFrame per k,
+             'stopped': 'completed' | 'early_stop' | 'time_budget', 'elapsed_s'}.
+    """
+    X = np.asarray(X, dtype='float64')
+    rng = np.random.default_rng(random_state)
+    sample = X[rng.choice(len(X), sample_size, replace=False)] if len(X) > sample_size else X
+    k_values = [k for k in k_values if 2 <= k < len(sample)]
+    if not k_values:
+        raise ValueError("Not enough rows to compare cluster counts.")
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(k_values)))
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    start = time.perf_counter()
+    deadline = start + time_budget
+    rows, best, stale, stopped = [], -np.inf, 0, 'completed'
+    try:
+        for i in range(0, len(k_values), workers):
+            wave = k_values[i:i + workers]
+            if executor:
+                futures = [executor.submit(_score_k, sample, k, silhouette_size, random_state) for k in wave]
+                done, pending = wait(futures, timeout=max(0.0, deadline - time.perf_counter()))
+                if not done and not rows:
+                    done, pending = wait(futures, return_when=FIRST_COMPLETED)
+                for future in pending:
+                    future.cancel()
+                results = [future.result() for future in done]
+            else:
+                results = []
+                for k in wave:
+                    if rows and time.perf_counter() > deadline:
+                        break
+                    results.append(_score_k(sample, k, silhouette_size, random_state))
+            for result in sorted(results, key=lambda r: r['k']):
+                rows.append(result)
+                if result['silhouette'] > best + 1e-3:
+                    best, stale = result['silhouette'], 0
+                else:
+                    stale += 1
+            last_wave = i + workers >= len(k_values)
+            if len(results) < len(wave) or (time.perf_counter() > deadline and not last_wave):
+                stopped = 'time_budget'
+                break
+            if stale >= patience and not last_wave:
+                stopped = 'early_stop'
+                break
+    finally:
+        if executor:
+            # Fits still running after the deadline are not waited for
+            executor.shutdown(wait=stopped != 'time_budget', cancel_futures=True)
+
+    scores = pd.DataFrame(rows).set_index('k')
+    elbow_k = _elbow(scores)
+    return {
+        'k': _vote(scores, elbow_k),
+        'elbow_k': elbow_k,
+        'scores': scores,
+        'stopped': stopped,
+        'elapsed_s': time.perf_counter() - start,
+    }
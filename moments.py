@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+
+class Moments:
+    """
+    Mergeable first and second moments for a fixed set of measures.
+
+    Keeps n, the mean vector and the co-moment matrix
+    C[i, j] = sum((x_i - mean_i) * (x_j - mean_j)).
+    Partial states from chunks, files or partitions combine exactly with
+    Chan's parallel update, which stays numerically stable (no raw sums of
+    squares are ever accumulated).
+    Rows with a missing value in any measure are skipped (listwise).
+    """
+
+    def __init__(self, measures):
+        self.measures = list(measures)
+        k = len(self.measures)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+
+    @classmethod
+    def from_array(cls, values, measures):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values).any(axis=1)]
+        state = cls(measures)
+        if len(values):
+            state.n = len(values)
+            state.mean = values.mean(axis=0)
+            centered = values - state.mean
+            state.comoment = centered.T @ centered
+        return state
+
+    def update(self, values):
+        """Folds a 2D array (rows x measures) into the state."""
+        return self.merge(Moments.from_array(values, self.measures))
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.comoment = other.n, other.mean.copy(), other.comoment.copy()
+            return self
+
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.n / n)
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / n)
+        self.n = n
+        return self
+
+    def variance(self, ddof=1):
+        if self.n - ddof <= 0:
+            return pd.Series(np.nan, index=self.measures)
+        return pd.Series(np.diag(self.comoment) / (self.n - ddof), index=self.measures)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    def covariance(self, ddof=1):
+        if self.n - ddof <= 0:
+            cov = np.full_like(self.comoment, np.nan)
+        else:
+            cov = self.comoment / (self.n - ddof)
+        return pd.DataFrame(cov, index=self.measures, columns=self.measures)
+
+    def correlation(self):
+        """Pearson correlation matrix (NaN where a measure is constant)."""
+        scale = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.outer(scale, scale)
+        corr[~np.isfinite(corr)] = np.nan
+        return pd.DataFrame(corr, index=self.measures, columns=self.measures)
+
+    def summary(self):
+        return pd.DataFrame({
+            'count': self.n,
+            'mean': pd.Series(self.mean, index=self.measures) if self.n else np.nan,
+            'variance': self.variance(),
+            'std': self.std(),
+        })
+
+
+class GroupedMoments:
+    """
+    Moments per group (any set of dimension columns), maintained in one
+    vectorized pass per chunk and mergeable like `Moments`.
+    """
+
+    def __init__(self, measures, by):
+        self.measures = list(measures)
+        self.by = list(by)
+        self.groups = {}
+
+    def update(self, df):
+        """Folds a DataFrame chunk holding the `by` and measure columns."""
+        df = df.dropna(subset=self.measures)
+        if df.empty:
+            return self
+
+        grouper = df.groupby(self.by, dropna=False, sort=False)
+        codes = grouper.ngroup().to_numpy()
+        n_groups = codes.max() + 1
+
+        values = df[self.measures].to_numpy(dtype='float64')
+        counts = np.bincount(codes, minlength=n_groups)
+        sums = np.column_stack([np.bincount(codes, weights=values[:, i], minlength=n_groups)
+                                for i in range(len(self.measures))])
+        means = sums / counts[:, None]
+        centered = values - means[codes]
+
+        k = len(self.measures)
+        comoments = np.zeros((n_groups, k, k))
+        for i in range(k):
+            for j in range(i, k):
+                c = np.bincount(codes, weights=centered[:, i] * centered[:, j], minlength=n_groups)
+                comoments[:, i, j] = c
+                comoments[:, j, i] = c
+
+        # Resolve each group code back to its key from the group's first row
+        first_rows = pd.Series(np.arange(len(codes))).groupby(codes).first().to_numpy()
+        key_frame = df[self.by].iloc[first_rows]
+        for code, key in enumerate(key_frame.itertuples(index=False, name=None)):
+            key = key if len(self.by) > 1 else key[0]
+            part = Moments(self.measures)
+            part.n, part.mean, part.comoment = int(counts[code]), means[code], comoments[code]
+            self.groups.setdefault(key, Moments(self.measures)).merge(part)
+        return self
+
+    def merge(self, other):
+        for key, state in other.groups.items():
+            self.groups.setdefault(key, Moments(self.measures)).merge(state)
+        return self
+
+    def total(self):
+        """Collapses every group into a single `Moments` state."""
+        state = Moments(self.measures)
+        for part in self.groups.values():
+            state.merge(part)
+        return state
+
+    def summary(self):
+        """Long-format table: one row per group and measure."""
+        rows = []
+        for key, state in self.groups.items():
+            key = key if isinstance(key, tuple) else (key,)
+            table = state.summary()
+            for measure, row in table.iterrows():
+                rows.append(dict(zip(self.by, key), measure=measure, **row.to_dict()))
+        return pd.DataFrame(rows)
+
+    def means(self, measure):
+        return pd.Series({key: state.mean[self.measures.index(measure)]
+                          for key, state in self.groups.items() if state.n}, name=measure)
@@ -0,0 +1,135 @@
+"""
+Background prefetch of page results.
+
+The app asks the scheduler for every result it renders. Results already
+computed (by the foreground or by a background worker) come from the store;
+once a page is rendered, the other pages' tasks are queued on low-priority
+worker threads so navigating there is served from the store.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _lower_priority(niceness):
+    """Worker initializer: raise the thread's nice value (Linux threads are tasks)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+    except (AttributeError, OSError):
+        pass
+
+
+class PrefetchScheduler:
+    """
+    Result store plus background workers, shared by every session of the app.
+
+    Results are keyed by (key, task), where key identifies the dataset and
+    filter selection. Each background task runs on its own engine over a
+    private DuckDB database limited to `engine_threads` threads
+    (AnalyticsEngine.filtered(threads=...), opened on the calling thread), so
+    with the default of 1 all of its query work runs on the niced worker
+    thread instead of DuckDB's shared thread pool.
+    Each session prefetches for one key at a time: when a session moves to a
+    new key, queued work for keys no session is on any more is cancelled and
+    its running queries are interrupted. Only the latest `max_keys` keys keep
+    results.
+    """
+
+    def __init__(self, max_workers=1, max_keys=8, niceness=10, engine_threads=1, max_sessions=64):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tva-prefetch',
+                                           initializer=_lower_priority, initargs=(niceness,))
+        self.max_keys = max_keys
+        self.engine_threads = engine_threads
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._sessions = OrderedDict()
+        self._futures = {}
+        self._workers = {}
+
+    def _store(self, key, task, result):
+        with self._lock:
+            self._results.setdefault(key, {})[task] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_keys:
+                self._results.popitem(last=False)
+
+    def get(self, key, task, compute, ae):
+        """
+        Result of `task` for `key`: from the store, from its running
+        background execution, or computed now with compute(ae). A task still
+        queued behind other background work is taken back and computed here.
+        """
+        with self._lock:
+            results = self._results.get(key)
+            if results is not None and task in results:
+                self._results.move_to_end(key)
+                return results[task]
+            future = self._futures.get((key, task))
+            if future is not None and future.cancel():
+                del self._futures[(key, task)]
+                self._workers.pop((key, task)).con.close()
+                future = None
+
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                # Cancelled or interrupted in the background: compute it here
+                pass
+        result = compute(ae)
+        self._store(key, task, result)
+        return result
+
+    def prefetch(self, key, ae, tasks, session=None):
+        """
+        Queues {task: compute} for `key` in the background, skipping results
+        already stored or queued. `session`'s work for its previous key is
+        cancelled unless another session is on that key too.
+        """
+        with self._lock:
+            if self._sessions.get(session) != key:
+                self._sessions[session] = key
+                self._sessions.move_to_end(session)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                self._cancel_stale()
+            done = self._results.get(key, {})
+            for task, compute in tasks.items():
+                if task in done or (key, task) in self._futures:
+                    continue
+                worker = ae.filtered(filters=ae.filters, date_range=ae.date_range, threads=self.engine_threads)
+                self._workers[(key, task)] = worker
+                self._futures[(key, task)] = self.executor.submit(self._run, key, task, compute, worker)
+
+    def _cancel_stale(self):
+        wanted = set(self._sessions.values())
+        for (other, task), future in list(self._futures.items()):
+            if other in wanted:
+                continue
+            worker = self._workers[(other, task)]
+            if future.cancel():
+                del self._futures[(other, task)]
+                del self._workers[(other, task)]
+                worker.con.close()
+            else:
+                # Already executing: abort its DuckDB query
+                worker.con.interrupt()
+
+    def _run(self, key, task, compute, worker):
+        try:
+            result = compute(worker)
+            self._store(key, task, result)
+            return result
+        finally:
+            with self._lock:
+                self._futures.pop((key, task), None)
+                self._workers.pop((key, task), None)
+            worker.con.close()
+
+    def progress(self, key, tasks):
+        """(ready, total) for the given task names of `key`."""
+        with self._lock:
+            done = self._results.get(key, {})
+            return sum(task in done for task in tasks), len(tasks)
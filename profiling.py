@@ -0,0 +1,224 @@
+import json
+import numpy as np
+import pandas as pd
+
+PROFILE_VERSION = 1
+# Columns with at most this many distinct values keep their value list
+MAX_TRACKED_VALUES = 256
+# Chunks with at most this many distinct values of a column keep a value set in the zone map
+MAX_ZONE_VALUES = 64
+
+
+def _kind(series):
+    if pd.api.types.is_bool_dtype(series):
+        return 'categorical'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    return 'categorical'
+
+
+def _scalar(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def count_coercion_failures(before, after):
+    """Values that were present before a to_numeric/to_datetime coercion but null after."""
+    return int((before.notna() & after.isna()).sum())
+
+
+class DatasetProfile:
+    """
+    Column statistics and per-chunk zone maps gathered in one pass at ingest.
+
+    columns[col]: kind, rows, nulls, coercion_failures, distinct, min, max,
+                  sum/mean (numeric), distinct_dates (datetime), values (low cardinality)
+    zone_maps:    [{'start', 'stop', 'columns': {col: {'min', 'max'} | {'values'}}}]
+    Answers metadata questions without scanning, doubles as a data-quality
+    report, and lets the engine skip row ranges that cannot match a filter.
+    """
+
+    def __init__(self, rows=0, chunk_size=65536, columns=None, zone_maps=None):
+        self.rows = rows
+        self.chunk_size = chunk_size
+        self.columns = columns or {}
+        self.zone_maps = zone_maps or []
+
+    # --- Metadata answers ---
+
+    def stat(self, column, key, default=None):
+        return self.columns.get(column, {}).get(key, default)
+
+    def distinct_values(self, column):
+        """Sorted distinct values when tracked (low cardinality), else None."""
+        values = self.stat(column, 'values')
+        return None if values is None else sorted(values, key=str)
+
+    def time_bounds(self, column='timestamp'):
+        lo, hi = self.stat(column, 'min'), self.stat(column, 'max')
+        return None if lo is None else (pd.Timestamp(lo), pd.Timestamp(hi))
+
+    def kpis(self):
+        """The dashboard KPI row, straight from the stats (None if not derivable)."""
+        needed = [('watch_time_minutes', 'sum'), ('user_id', 'distinct'),
+                  ('completion_rate', 'mean'), ('watch_time_minutes', 'mean')]
+        if any(self.stat(c, k) is None for c, k in needed):
+            return None
+        return {
+            'total_screentime': float(self.stat('watch_time_minutes', 'sum')),
+            'active_customers': int(self.stat('user_id', 'distinct')),
+            'avg_completion_pct': self.stat('completion_rate', 'mean') * 100,
+            'avg_watch_time': self.stat('watch_time_minutes', 'mean'),
+        }
+
+    def quality_report(self):
+        """One row per column: nulls, coercion failures, distinct count and range."""
+        rows = []
+        for col, s in self.columns.items():
+            rows.append({
+                'column': col,
+                'kind': s['kind'],
+                'rows': s['rows'],
+                'nulls': s['nulls'],
+                'null_pct': 100 * s['nulls'] / s['rows'] if s['rows'] else 0.0,
+                'coercion_failures': s.get('coercion_failures', 0),
+                'distinct': s['distinct'],
+                # Mixed types across columns, so shown as text
+                'min': None if s.get('min') is None else str(s['min']),
+                'max': None if s.get('max') is None else str(s['max']),
+            })
+        return pd.DataFrame(rows)
+
+    # --- Zone maps ---
+
+    def _chunk_can_match(self, zone, filters, date_range):
+        for col, wanted in filters.items():
+            stats = zone['columns'].get(col)
+            if stats is None:
+                continue
+            wanted = list(wanted) if isinstance(wanted, (list, tuple, set)) else [wanted]
+            if 'values' in stats:
+                if not set(wanted) & set(stats['values']):
+                    return False
+            elif stats.get('min') is not None and isinstance(wanted[0], (int, float)):
+                if all(w < stats['min'] or w > stats['max'] for w in wanted):
+                    return False
+        if date_range:
+            stats = zone['columns'].get('timestamp')
+            if stats and stats.get('min') is not None:
+                start, end = date_range
+                if pd.Timestamp(stats['max']) < start or pd.Timestamp(stats['min']) >= end:
+                    return False
+        return True
+
+    def matching_ranges(self, filters=None, date_range=None):
+        """
+        Row ranges [(start, stop), ...] whose zone maps may satisfy the filters
+        (adjacent chunks coalesced). date_range is (start, end) with end exclusive.
+        """
+        ranges = []
+        for zone in self.zone_maps:
+            if self._chunk_can_match(zone, filters or {}, date_range):
+                if ranges and ranges[-1][1] == zone['start']:
+                    ranges[-1] = (ranges[-1][0], zone['stop'])
+                else:
+                    ranges.append((zone['start'], zone['stop']))
+        return ranges
+
+    # --- Persistence ---
+
+    def to_dict(self):
+        return {'version': PROFILE_VERSION, 'rows': self.rows, 'chunk_size': self.chunk_size,
+                'columns': self.columns, 'zone_maps': self.zone_maps}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, default=str)
+        return path
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['rows'], data['chunk_size'], data['columns'], data['zone_maps'])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def profile_dataframe(df, coercion_failures=None, chunk_size=65536):
+    """
+    Single pass over row chunks: every chunk updates the running column
+    stats and emits its zone map.
+    """
+    coercion_failures = coercion_failures or {}
+    kinds = {col: _kind(df[col]) for col in df.columns}
+    running = {col: {'nulls': 0, 'min': None, 'max': None, 'sum': 0.0, 'count': 0,
+                     'hashes': [], 'dates': [], 'values': set()} for col in df.columns}
+    zone_maps = []
+
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        zone = {'start': start, 'stop': start + len(chunk), 'columns': {}}
+
+        for col in df.columns:
+            series = chunk[col]
+            acc = running[col]
+            present = series.dropna()
+            acc['nulls'] += len(series) - len(present)
+            if present.empty:
+                zone['columns'][col] = {'min': None, 'max': None}
+                continue
+
+            uniques = pd.unique(present)
+            raw = np.asarray(uniques) if kinds[col] in ('numeric', 'datetime') else np.asarray(uniques, dtype=object)
+            acc['hashes'].append(pd.util.hash_array(raw))
+            if acc['values'] is not None:
+                acc['values'].update(uniques.tolist())
+                if len(acc['values']) > MAX_TRACKED_VALUES:
+                    acc['values'] = None
+
+            if kinds[col] in ('numeric', 'datetime'):
+                lo, hi = present.min(), present.max()
+                acc['min'] = lo if acc['min'] is None else min(acc['min'], lo)
+                acc['max'] = hi if acc['max'] is None else max(acc['max'], hi)
+                zone['columns'][col] = {'min': _scalar(lo), 'max': _scalar(hi)}
+                if kinds[col] == 'numeric':
+                    acc['sum'] += float(present.sum())
+                    acc['count'] += len(present)
+                else:
+                    acc['dates'].append(np.unique(present.dt.normalize().to_numpy()))
+            elif len(uniques) <= MAX_ZONE_VALUES:
+                zone['columns'][col] = {'values': [_scalar(v) for v in uniques]}
+
+        zone_maps.append(zone)
+
+    columns = {}
+    for col in df.columns:
+        acc = running[col]
+        hashes = pd.unique(np.concatenate(acc['hashes'])) if acc['hashes'] else []
+        stats = {
+            'kind': kinds[col],
+            'rows': len(df),
+            'nulls': acc['nulls'],
+            'coercion_failures': int(coercion_failures.get(col, 0)),
+            'distinct': len(hashes),
+            'min': _scalar(acc['min']),
+            'max': _scalar(acc['max']),
+            'values': None if acc['values'] is None else [_scalar(v) for v in acc['values']],
+        }
+        if kinds[col] == 'numeric':
+            stats['sum'] = acc['sum']
+            stats['mean'] = acc['sum'] / acc['count'] if acc['count'] else None
+        if kinds[col] == 'datetime':
+            stats['distinct_dates'] = len(np.unique(np.concatenate(acc['dates']))) if acc['dates'] else 0
+        columns[col] = stats
+
+    return DatasetProfile(len(df), chunk_size, columns, zone_maps)
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+# Percentiles served for Quality-of-Experience measures
+QOE_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang & Liberty) for a stream of numbers.
+
+    Items live in a stack of compactors; an item on level h stands for 2^h
+    inputs. When a level outgrows its capacity it is sorted and every other
+    item (random offset) is promoted, so memory stays O(k log(n/k)) while
+    rank error is about 1.7 / k of n. Sketches with the same k merge
+    level by level, so partial sketches from chunks, partitions or files
+    combine into the sketch of their union.
+    """
+
+    def __init__(self, k=200, seed=42):
+        self.k = int(k)
+        self.seed = seed
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        # Lower levels get geometrically (2/3) smaller than the top one
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Adds a batch of values (NaNs are ignored)."""
+        values = np.asarray(values, dtype='float64').ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.n += values.size
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        if other.k != self.k:
+            raise ValueError("KLL sketches must share k to be merged.")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def copy(self):
+        clone = KLLSketch(self.k, self.seed)
+        clone.n, clone.min, clone.max = self.n, self.min, self.max
+        clone.levels = [items.copy() for items in self.levels]
+        return clone
+
+    def _compress(self):
+        while True:
+            level = next((h for h, items in enumerate(self.levels) if len(items) > self._capacity(h)), None)
+            if level is None:
+                return
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            items = np.sort(self.levels[level])
+            # An odd item out stays behind so the total weight remains exactly n
+            if len(items) % 2:
+                if self._rng.integers(2):
+                    keep, items = items[:1], items[1:]
+                else:
+                    keep, items = items[-1:], items[:-1]
+            else:
+                keep = items[:0]
+            promoted = items[self._rng.integers(2)::2]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            self.levels[level] = keep
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantiles(self, qs=QOE_QUANTILES):
+        """Approximate values at the given ranks (0..1); exact min/max at 0 and 1."""
+        qs = np.asarray(qs, dtype='float64')
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        items, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        idx = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        result = items[np.minimum(idx, len(items) - 1)]
+        result[qs <= 0] = self.min
+        result[qs >= 1] = self.max
+        return result
+
+    def histogram(self, bins=30, value_range=None):
+        """Estimated counts per bin: DataFrame of bin_start, bin_end, count."""
+        if self.n == 0:
+            return pd.DataFrame(columns=['bin_start', 'bin_end', 'count'])
+        items, weights = self._weighted()
+        counts, edges = np.histogram(items, bins=bins, range=value_range or (self.min, self.max), weights=weights)
+        return pd.DataFrame({'bin_start': edges[:-1], 'bin_end': edges[1:], 'count': counts})
+
+
+class GroupedQuantiles:
+    """
+    One KLL sketch per group and measure, e.g. startup time and watch time
+    per region x device x video_format. Groups can be rolled up to any
+    subset of the dimensions at query time by merging their sketches.
+    """
+
+    def __init__(self, measures, by, k=200):
+        self.measures = list(measures)
+        self.by = list(by)
+        self.k = k
+        self.groups = {}
+
+    def update(self, df):
+        """Folds a DataFrame chunk holding the `by` and measure columns."""
+        if df.empty:
+            return self
+        codes = df.groupby(self.by, dropna=False, sort=False).ngroup().to_numpy()
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        bounds = np.r_[starts, len(order)]
+
+        values = {m: df[m].to_numpy(dtype='float64')[order] for m in self.measures}
+        key_frame = df[self.by].iloc[order[starts]]
+        for i, key in enumerate(key_frame.itertuples(index=False, name=None)):
+            # NaN keys would never compare equal, so missing values group under None
+            key = tuple(None if pd.isna(v) else v for v in key)
+            key = key if len(self.by) > 1 else key[0]
+            sketches = self.groups.setdefault(key, {m: KLLSketch(self.k) for m in self.measures})
+            for m in self.measures:
+                sketches[m].update(values[m][bounds[i]:bounds[i + 1]])
+        return self
+
+    def merge(self, other):
+        for key, sketches in other.groups.items():
+            mine = self.groups.setdefault(key, {m: KLLSketch(self.k) for m in self.measures})
+            for m, sketch in sketches.items():
+                mine[m].merge(sketch)
+        return self
+
+    def _key_dict(self, key):
+        return dict(zip(self.by, key if isinstance(key, tuple) else (key,)))
+
+    def _matches(self, key, slices):
+        """Whether a group lies in the slices: {column: value or list of values}, None/'All' for any."""
+        labels = self._key_dict(key)
+        return all(value in (None, 'All')
+                   or (labels.get(col) in value if isinstance(value, (list, tuple, set)) else labels.get(col) == value)
+                   for col, value in slices.items())
+
+    def where(self, **slices):
+        """
+        Copy holding only the groups matching the slices, e.g. the sketches of
+        a filter selection taken from the whole dataset's without re-reading
+        any events.
+        """
+        sliced = GroupedQuantiles(self.measures, self.by, k=self.k)
+        sliced.groups = {key: {m: sketch.copy() for m, sketch in sketches.items()}
+                         for key, sketches in self.groups.items() if self._matches(key, slices)}
+        return sliced
+
+    def sketch(self, measure, **slices):
+        """Merged sketch of every group matching the slices (e.g. region='North')."""
+        merged = KLLSketch(self.k)
+        for key, sketches in self.groups.items():
+            if self._matches(key, slices):
+                merged.merge(sketches[measure])
+        return merged
+
+    def summary(self, measure, by=None, quantiles=QOE_QUANTILES):
+        """
+        Count and percentiles (p50, p90, ...) of a measure per value of `by`
+        (a subset of the sketch dimensions; None for the overall row).
+        """
+        by = [by] if isinstance(by, str) else list(by or [])
+        rolled = {}
+        for key, sketches in self.groups.items():
+            labels = self._key_dict(key)
+            target = tuple(labels[col] for col in by)
+            if target not in rolled:
+                rolled[target] = KLLSketch(self.k)
+            rolled[target].merge(sketches[measure])
+
+        rows = []
+        for target, sketch in rolled.items():
+            row = dict(zip(by, target), count=sketch.n)
+            for q, value in zip(quantiles, sketch.quantiles(quantiles)):
+                row[f'p{q * 100:g}'] = value
+            rows.append(row)
+        result = pd.DataFrame(rows)
+        return result.sort_values(by).reset_index(drop=True) if by and not result.empty else result
+
+    def histogram(self, measure, bins=30, **slices):
+        return self.sketch(measure, **slices).histogram(bins)
@@ -0,0 +1,190 @@
+"""
+Progressive answers: the KPI row, dimension breakdowns and SAI estimated
+from a small stratified sample in milliseconds, with confidence intervals,
+while the exact queries run in the background.
+"""
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# Strata of the event sample: every region x genre cell is represented
+SAMPLE_STRATA = ('region', 'genre')
+# Low-cardinality columns kept with the user sample, so filters and breakdowns apply to it
+SAMPLE_DIMENSIONS = ('region', 'device', 'genre', 'segment', 'video_format')
+HASH_SPACE = 2 ** 64
+
+
+class StratifiedSample:
+    """
+    Stratified event sample plus a KMV (k minimum values) sample of users,
+    built once per dataset in a few scans and reused for every filter.
+
+    rows:   about `size` events; each stratum is sampled uniformly without
+            replacement (the rows with the smallest random keys, i.e. a
+            bottom-k reservoir) and keeps at least min_per_stratum rows.
+            Extra columns: _stratum and _weight (stratum rows / sampled rows).
+    strata: per stratum: the `by` values, rows (population) and sampled.
+    users:  distinct (user, dimensions, day) tuples of the users whose hash
+            is below theta. A filtered distinct count is the number of
+            matching users / theta.
+    Totals are Horvitz-Thompson estimates with the stratified-sampling
+    variance; averages are ratio estimates with a linearized variance.
+    """
+
+    def __init__(self, rows, strata, users, theta, by, confidence=0.95):
+        self.rows = rows
+        self.strata = strata
+        self.users = users
+        self.theta = theta
+        self.by = list(by)
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    @classmethod
+    def from_engine(cls, ae, by=SAMPLE_STRATA, size=20_000, error_target=None, distinct_k=4096,
+                    min_per_stratum=30, confidence=0.95, seed=42):
+        """
+        Samples the engine's unfiltered events (events_source).
+        error_target: relative half-width (e.g. 0.02 for ±2%) wanted at
+        `confidence` for average watch time and distinct users; when given it
+        sets `size` and `distinct_k` instead.
+        """
+        con = ae.con
+        source_cols = list(con.execute("SELECT * FROM events_source LIMIT 0").df().columns)
+        by = [c for c in by if c in ae.columns]
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+        group = ', '.join(f'"{c}"' for c in by)
+        strata = con.execute(f"""
+        SELECT {group + ',' if by else ''} COUNT(*) AS rows,
+               SUM(watch_time_minutes) AS watch_sum, SUM(watch_time_minutes * watch_time_minutes) AS watch_sumsq
+        FROM events_source {'GROUP BY ALL' if by else ''}
+        """).df()
+        population = strata['rows'].sum()
+
+        if error_target:
+            # n = (z * CV / e)^2 for the mean (proportional allocation only helps); KMV error ~ 1 / sqrt(k)
+            mean = strata['watch_sum'].sum() / population
+            variance = (strata['watch_sumsq'].sum() - population * mean ** 2) / max(population - 1, 1)
+            cv = math.sqrt(max(variance, 0)) / mean if mean else 1.0
+            size = math.ceil((z * cv / error_target) ** 2)
+            distinct_k = math.ceil((z / error_target) ** 2) + 2
+
+        strata = strata.drop(columns=['watch_sum', 'watch_sumsq'])
+        strata['_stratum'] = np.arange(len(strata))
+        strata['quota'] = np.minimum(strata['rows'], np.maximum(
+            min_per_stratum, np.ceil(size * strata['rows'] / population))).astype('int64')
+
+        # Bottom-k per stratum on a uniform key per row (a row hash would keep or drop
+        # duplicate events together): one scan keeps ~1.2x the quota, QUALIFY cuts it
+        join = ' AND '.join(f's."{c}" IS NOT DISTINCT FROM q."{c}"' for c in by) or 'TRUE'
+        con.register('sample_strata', strata)
+        con.execute(f"SELECT setseed({(seed % 1000) / 1000})")
+        rows = con.execute(f"""
+        SELECT * EXCLUDE (_key, _quota, _rows) FROM (
+            SELECT s.*, q._stratum, q.quota AS _quota, q.rows AS _rows, random() AS _key
+            FROM events_source s JOIN sample_strata q ON {join}
+        )
+        WHERE _key < LEAST(1.0, 1.2 * _quota / _rows)
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY _stratum ORDER BY _key) <= _quota
+        """).df()
+        con.unregister('sample_strata')
+
+        strata = strata.drop(columns=['quota']).set_index('_stratum')
+        strata['sampled'] = rows['_stratum'].value_counts().reindex(strata.index, fill_value=0)
+        rows['_weight'] = (strata['rows'] / strata['sampled']).reindex(rows['_stratum']).to_numpy()
+
+        users, theta = cls._sample_users(ae, source_cols, distinct_k, seed)
+        return cls(rows, strata, users, theta, by, confidence)
+
+    @staticmethod
+    def _sample_users(ae, source_cols, k, seed):
+        """KMV: the users with the k smallest hashes, one row per (user, dimensions, day)."""
+        if 'user_id' not in source_cols:
+            return pd.DataFrame(columns=['user_hash']), 1.0
+        distinct = ae.profile.stat('user_id', 'distinct') if ae.profile is not None else None
+        if distinct is None:
+            distinct = ae.con.execute("SELECT approx_count_distinct(user_id) FROM events_source").fetchone()[0]
+        # Pre-filter at twice the expected k-th hash so only a few users reach the DISTINCT
+        theta = min(1.0, 2 * k / max(distinct or 1, 1))
+        # hash(user_id, seed) barely changes with the seed; re-hashing the seeded hash does
+        user_hash = f"hash(xor(hash(user_id), {int(seed)}::UBIGINT))"
+        keep = [f'"{c}"' for c in SAMPLE_DIMENSIONS if c in source_cols]
+        if 'timestamp' in source_cols:
+            keep.append("date_trunc('day', timestamp) AS timestamp")
+        if 'month' in source_cols:
+            keep.append('month')
+        where = "user_id IS NOT NULL" + (f" AND {user_hash} < {int(theta * HASH_SPACE)}::UBIGINT" if theta < 1 else "")
+        users = ae.con.execute(f"SELECT DISTINCT {user_hash} AS user_hash, {', '.join(keep)} FROM events_source WHERE {where}").df()
+
+        hashes = np.unique(users['user_hash'].to_numpy())
+        if len(hashes) >= k:
+            # The k-th smallest hash becomes theta; the k - 1 users below it are kept
+            kth = hashes[k - 1]
+            theta = float(kth) / HASH_SPACE
+            users = users[users['user_hash'] < kth].reset_index(drop=True)
+        return users, theta
+
+    # --- Estimators ---
+
+    def _total(self, rows, values):
+        """Estimated total of `values` over the (filtered) sample rows, and its variance."""
+        sums = pd.DataFrame({'h': rows['_stratum'].to_numpy(), 'z': values, 'z2': values ** 2}).groupby('h').sum()
+        N = self.strata['rows'].reindex(sums.index).astype('float64')
+        n = self.strata['sampled'].reindex(sums.index).astype('float64')
+        # Rows outside the filter count as zeros of their stratum's sample
+        s2 = ((sums['z2'] - sums['z'] ** 2 / n) / (n - 1)).where(n > 1, 0.0).clip(lower=0)
+        return float((N / n * sums['z']).sum()), float((N ** 2 * (1 - n / N) * s2 / n).sum())
+
+    def _mean(self, rows, column):
+        """Ratio estimate of AVG(column) (nulls ignored) and its variance."""
+        values = rows[column].to_numpy(dtype='float64')
+        present = ~np.isnan(values)
+        count, _ = self._total(rows, present.astype('float64'))
+        total, _ = self._total(rows, np.where(present, values, 0.0))
+        if count == 0:
+            return np.nan, 0.0
+        mean = total / count
+        _, variance = self._total(rows, np.where(present, values - mean, 0.0))
+        return mean, variance / count ** 2
+
+    def _distinct(self, users):
+        """Distinct users among the (filtered) user sample, and its variance."""
+        matched = users['user_hash'].nunique()
+        return matched / self.theta, matched * (1 - self.theta) / self.theta ** 2
+
+    def _interval(self, name, estimate, variance, scale=1.0):
+        half = self.z * math.sqrt(variance) * scale
+        return {name: estimate * scale, f'{name}_low': estimate * scale - half, f'{name}_high': estimate * scale + half}
+
+    def kpis(self, rows, users):
+        """get_kpis() estimated from filtered sample rows/users, with <kpi>_low / <kpi>_high bounds."""
+        result = {}
+        result.update(self._interval('total_screentime', *self._total(
+            rows, rows['watch_time_minutes'].fillna(0).to_numpy(dtype='float64'))))
+        result.update(self._interval('active_customers', *self._distinct(users)))
+        result.update(self._interval('avg_completion_pct', *self._mean(rows, 'completion_rate'), scale=100))
+        result.update(self._interval('avg_watch_time', *self._mean(rows, 'watch_time_minutes')))
+        result['sample_rows'] = len(rows)
+        result['confidence'] = self.confidence
+        return result
+
+    def breakdown(self, rows, users, dimension):
+        """
+        Events, total/average watch time and unique viewers per value of
+        `dimension`, each with _low / _high bounds, by total watch time.
+        """
+        out = []
+        for value, part in rows.groupby(dimension, sort=False):
+            row = {dimension: value}
+            row.update(self._interval('events', *self._total(part, np.ones(len(part)))))
+            row.update(self._interval('total_watch_time', *self._total(
+                part, part['watch_time_minutes'].fillna(0).to_numpy(dtype='float64'))))
+            row.update(self._interval('avg_watch_time', *self._mean(part, 'watch_time_minutes')))
+            if dimension in users.columns:
+                row.update(self._interval('unique_viewers', *self._distinct(users[users[dimension] == value])))
+            out.append(row)
+        result = pd.DataFrame(out)
+        return result.sort_values('total_watch_time', ascending=False).reset_index(drop=True) if out else result
@@ -0,0 +1,252 @@
+"""
+Local async JSON query service over one shared AnalyticsEngine.
+
+    python service.py serve --data autogravity_dataset.xlsx --port 8765
+    curl 'http://127.0.0.1:8765/api/kpis?region=North&date_from=2025-01-01&date_to=2025-01-31'
+
+    python service.py bench --url 'http://127.0.0.1:8765/api/kpis' --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from etl import load_data
+from analytics import AnalyticsEngine
+from insights import compute_insights, get_cluster_summary, to_jsonable
+
+FILTER_PARAMS = ('region', 'device', 'genre', 'segment')
+# Parameters that must be positive integers
+INT_PARAMS = ('k',)
+
+
+def _frame(df):
+    return df.reset_index() if not df.empty and df.index.name is not None else df
+
+
+# endpoint -> callable(engine, params). Every callable runs on an executor thread.
+ENDPOINTS = {
+    'kpis': lambda ae, p: ae.get_kpis(),
+    'time_series': lambda ae, p: ae.get_time_series(),
+    'geographic_stats': lambda ae, p: ae.get_geographic_stats(),
+    'content_intelligence': lambda ae, p: ae.get_content_intelligence(),
+    'infrastructure_insights': lambda ae, p: ae.get_infrastructure_insights(),
+    'qoe_percentiles': lambda ae, p: ae.get_qoe_quantiles().summary(p.get('measure', 'video_startup_time_sec'), by=p.get('by')),
+    'device_ratio': lambda ae, p: {'device_ratio': ae.get_device_ratio()},
+    'recurrence': lambda ae, p: ae.get_recurrence_metrics(),
+    'format_correlation': lambda ae, p: dict(zip(('correlation', 'format_performance'), ae.get_format_correlation())),
+    'period_comparison': lambda ae, p: ae.get_period_comparison(p.get('period', 'month'), p.get('dimension')),
+    'cross_distribution': lambda ae, p: _frame(ae.get_cross_distribution(p['col1'], p['col2'], p.get('metric', 'watch_time_minutes'))),
+    'top_content': lambda ae, p: ae.get_top_content_ranking(k=int(p.get('k', 10)), approximate=p.get('approximate') == 'true'),
+    'sai': lambda ae, p: _frame(ae.get_sai()),
+    'cohorts': lambda ae, p: _frame(ae.get_cohorts(p.get('period', 'month')).matrix(p.get('metric', 'retention'))),
+    'clusters': lambda ae, p: get_cluster_summary(ae),
+    'insights': lambda ae, p: compute_insights(ae, include_clusters=p.get('clusters', 'true') == 'true'),
+}
+
+
+class AnalyticsService:
+    """
+    Serves ENDPOINTS from one loaded dataset. Blocking DuckDB/pandas work runs
+    on a bounded thread pool (each call on its own cursor via
+    AnalyticsEngine.filtered); concurrent identical queries are coalesced
+    into a single execution.
+    """
+
+    def __init__(self, engine, max_workers=4, max_pending=256):
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tva-query')
+        self.max_pending = max_pending
+        self._inflight = {}
+        self.stats = {'requests': 0, 'executed': 0, 'coalesced': 0, 'rejected': 0}
+
+    def _run(self, endpoint, params):
+        filters = {k: params[k] for k in FILTER_PARAMS if k in params}
+        date_range = (params['date_from'], params['date_to']) if 'date_from' in params and 'date_to' in params else None
+        ae = self.engine.filtered(filters=filters, date_range=date_range)
+        try:
+            return to_jsonable(ENDPOINTS[endpoint](ae, params))
+        finally:
+            ae.con.close()
+
+    async def query(self, endpoint, params):
+        """Returns the JSON-ready result, sharing in-flight executions."""
+        self.stats['requests'] += 1
+        key = (endpoint, tuple(sorted(params.items())))
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        if len(self._inflight) >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise OverflowError("Too many pending queries")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self._run, endpoint, params)
+        self._inflight[key] = future
+        self.stats['executed'] += 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def handle(self, reader, writer):
+        """Minimal HTTP/1.1 (GET only, keep-alive) connection handler."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    break
+                method, target, _ = parts
+                status, body = await self._dispatch(method, target)
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target):
+        if method != 'GET':
+            return '405 Method Not Allowed', {'error': 'Only GET is supported'}
+
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = url.path.rstrip('/')
+
+        if path in ('', '/health'):
+            return '200 OK', {'status': 'ok', 'endpoints': sorted(ENDPOINTS), 'stats': self.stats}
+        if not path.startswith('/api/') or path[5:] not in ENDPOINTS:
+            return '404 Not Found', {'error': f'Unknown endpoint {url.path}'}
+        for name in INT_PARAMS:
+            if name in params and not (params[name].isdigit() and int(params[name]) > 0):
+                return '400 Bad Request', {'error': f'Parameter {name} must be a positive integer'}
+
+        try:
+            return '200 OK', await self.query(path[5:], params)
+        except OverflowError as e:
+            return '503 Service Unavailable', {'error': str(e)}
+        except KeyError as e:
+            return '400 Bad Request', {'error': f'Missing parameter {e}'}
+        except Exception as e:
+            return '500 Internal Server Error', {'error': str(e)}
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving {len(ENDPOINTS)} endpoints on http://{host}:{port}/api/<endpoint>")
+        async with server:
+            await server.serve_forever()
+
+
+# --- Load testing ---
+
+async def _timed_get(host, port, path, latencies, errors):
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+        await writer.drain()
+        status = await reader.readline()
+        await reader.read()
+        writer.close()
+        if b' 200 ' not in status:
+            errors.append(status.decode('latin-1').strip())
+    except OSError as e:
+        errors.append(str(e))
+    latencies.append(time.perf_counter() - start)
+
+
+async def run_bench(url, requests=1000, concurrency=32):
+    """Fires `requests` GETs with bounded concurrency and reports latency percentiles."""
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    latencies, errors = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await _timed_get(parts.hostname, parts.port or 80, path, latencies, errors)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    report = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'throughput_rps': requests / wall,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TVAnalytics local JSON query service.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help="Load one dataset and serve it")
+    source = serve.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help="Excel workbook to load")
+    source.add_argument('--event-store', help="Parquet event store directory (out-of-core)")
+    source.add_argument('--snapshot', help="Arrow snapshot file (memory-mapped, shared between processes)")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--workers', type=int, default=4, help="Query executor threads")
+    serve.add_argument('--memory-limit', help="DuckDB memory budget, e.g. 2GB")
+
+    bench = sub.add_parser('bench', help="Load-test an endpoint and report p50/p99 latency")
+    bench.add_argument('--url', default='http://127.0.0.1:8765/api/kpis')
+    bench.add_argument('--requests', type=int, default=1000)
+    bench.add_argument('--concurrency', type=int, default=32)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        if args.event_store:
+            engine = AnalyticsEngine.from_event_store(args.event_store, memory_limit=args.memory_limit)
+        elif args.snapshot:
+            engine = AnalyticsEngine.from_snapshot(args.snapshot, memory_limit=args.memory_limit)
+        else:
+            data = load_data(args.data)
+            engine = AnalyticsEngine(data['dataset'], memory_limit=args.memory_limit, profile=data['profile'])
+        service = AnalyticsService(engine, max_workers=args.workers)
+        try:
+            asyncio.run(service.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        report = asyncio.run(run_bench(args.url, args.requests, args.concurrency))
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import glob
+import json
+import os
+import shutil
+import sys
+import duckdb
+
+DEFAULT_ROW_GROUP_SIZE = 122880
+# Ingest profile (column stats, data quality) persisted next to the Parquet files
+PROFILE_FILE = '_profile.json'
+# Schema metadata key holding the profile inside an Arrow snapshot
+SNAPSHOT_PROFILE_KEY = b'tva_profile'
+
+
+def event_store_glob(root):
+    return os.path.join(root, '**', '*.parquet')
+
+
+def write_event_store(df, root, row_group_size=DEFAULT_ROW_GROUP_SIZE, profile=None):
+    """
+    Writes normalized video_events as Hive-partitioned Parquet:
+        root/month=YYYY-MM/region=<region>/data_0.parquet
+    Rows are sorted by timestamp inside each file so the per row-group
+    min/max statistics are tight and date-range filters can skip row groups.
+    A DatasetProfile, when given, is saved alongside as _profile.json.
+    An existing store at `root` is replaced as a whole: the new one is
+    written next to it and swapped in, so no partition of the old store
+    survives and readers never see a half-written one.
+    """
+    root = os.path.normpath(root)
+    partial = f"{root}.tmp-{os.getpid()}"
+    shutil.rmtree(partial, ignore_errors=True)
+
+    con = duckdb.connect(database=':memory:')
+    con.register('events_df', df)
+
+    select = "SELECT *"
+    order_by = ""
+    partition_by = []
+    if 'timestamp' in df.columns:
+        select += ", strftime(timestamp, '%Y-%m') AS month"
+        order_by = "ORDER BY timestamp"
+        partition_by.append('month')
+    if 'region' in df.columns:
+        partition_by.append('region')
+
+    options = ["FORMAT PARQUET", f"ROW_GROUP_SIZE {int(row_group_size)}"]
+    if partition_by:
+        options.append(f"PARTITION_BY ({', '.join(partition_by)})")
+    else:
+        os.makedirs(partial)
+    target = partial if partition_by else os.path.join(partial, 'data_0.parquet')
+
+    con.execute(f"COPY ({select} FROM events_df {order_by}) TO '{target}' ({', '.join(options)})")
+    if partition_by and order_by:
+        # Partitioned writes do not keep the ORDER BY inside each file, so
+        # every partition file is rewritten sorted (one partition at a time)
+        for path in glob.glob(event_store_glob(partial), recursive=True):
+            sorted_path = f"{path}.sorted"
+            con.execute(f"""
+            COPY (SELECT * FROM read_parquet('{path}', hive_partitioning = false) {order_by})
+            TO '{sorted_path}' (FORMAT PARQUET, ROW_GROUP_SIZE {int(row_group_size)})
+            """)
+            os.replace(sorted_path, path)
+    con.close()
+
+    if profile is not None:
+        profile.save(os.path.join(partial, PROFILE_FILE))
+
+    previous = f"{root}.old-{os.getpid()}"
+    if os.path.exists(root):
+        os.replace(root, previous)
+    os.replace(partial, root)
+    shutil.rmtree(previous, ignore_errors=True)
+    return root
+
+
+def register_event_store(con, root, name='events_source'):
+    """
+    Creates a view over the partitioned store. Partition columns come back
+    from the directory names; filters on them prune whole directories.
+    The view is TEMP, i.e. private to `con`: cursors of one database each
+    register their own without writing to the shared catalog.
+    """
+    con.execute(f"""
+    CREATE OR REPLACE TEMP VIEW {name} AS
+    SELECT * FROM read_parquet('{event_store_glob(root)}', hive_partitioning = true, hive_types_autocast = false, union_by_name = true)
+    """)
+    return con
+
+
+def write_snapshot(df, path, profile=None):
+    """
+    Writes normalized video_events once as an uncompressed Arrow IPC
+    (Feather v2) file for open_snapshot. The DatasetProfile, when given, is
+    kept in the schema metadata. The file is written next to `path` and
+    renamed into place, so workers never map a half-written snapshot.
+    Columns are typed by DuckDB, like the engines' views of the frame:
+    object columns mixing types (e.g. int and string user ids) become
+    VARCHAR instead of failing the Arrow conversion.
+    """
+    import pyarrow as pa
+
+    con = duckdb.connect(database=':memory:')
+    con.register('events_df', df)
+    batches = con.execute("SELECT * FROM events_df").fetch_record_batch()
+    schema = batches.schema
+    if profile is not None:
+        metadata = dict(schema.metadata or {})
+        metadata[SNAPSHOT_PROFILE_KEY] = json.dumps(profile.to_dict(), ensure_ascii=False, default=str).encode('utf-8')
+        schema = schema.with_metadata(metadata)
+
+    partial = f"{path}.tmp-{os.getpid()}"
+    with pa.OSFile(partial, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    con.close()
+    os.replace(partial, path)
+    return path
+
+
+def open_snapshot(path):
+    """
+    Memory-maps a snapshot written by write_snapshot and returns
+    (pyarrow.Table, DatasetProfile or None). The columns point straight
+    into the mapped file: nothing is parsed or copied, and every process
+    mapping the same file shares its pages through the OS page cache.
+    """
+    import pyarrow as pa
+    from profiling import DatasetProfile
+
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    raw = (table.schema.metadata or {}).get(SNAPSHOT_PROFILE_KEY)
+    profile = DatasetProfile.from_dict(json.loads(raw)) if raw else None
+    return table, profile
+
+
+if __name__ == "__main__":
+    # Usage: python storage.py <dataset.xlsx> <store_dir>
+    #        python storage.py <dataset.xlsx> <snapshot.arrow>
+    from etl import load_data
+
+    if len(sys.argv) != 3:
+        print("Usage: python storage.py <dataset.xlsx> <store_dir | snapshot.arrow>")
+        sys.exit(1)
+
+    data = load_data(sys.argv[1])
+    if sys.argv[2].endswith(('.arrow', '.feather')):
+        write_snapshot(data['dataset'], sys.argv[2], profile=data.get('profile'))
+        print(f"Snapshot written to {sys.argv[2]}")
+    else:
+        write_event_store(data['dataset'], sys.argv[2], profile=data.get('profile'))
+        print(f"Event store written to {sys.argv[2]}")
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+
+def exact_top_k(con, target, k, metric='watch_time_minutes', table='video_events'):
+    """
+    Exact Top-K via SQL. DuckDB plans ORDER BY ... LIMIT as a TOP_N operator
+    (heap based partial sort), so only k groups are kept sorted.
+    k=None returns the full ranking.
+    """
+    limit = f"LIMIT {int(k)}" if k is not None else ""
+    query = f"""
+    SELECT "{target}" AS item, SUM("{metric}") AS total
+    FROM {table}
+    WHERE "{target}" IS NOT NULL
+    GROUP BY 1
+    ORDER BY total DESC
+    {limit}
+    """
+    result = con.execute(query).df()
+    return pd.Series(result['total'].values, index=pd.Index(result['item'], name=target), name=metric)
+
+
+class SpaceSaving:
+    """
+    Weighted Space-Saving summary (Metwally et al.) for heavy hitters.
+
+    Keeps at most `capacity` counters. For every monitored item:
+        count - error <= true weight <= count
+    and any unmonitored item has a true weight <= `floor`.
+    Summaries built on different batches/partitions can be merged.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = int(capacity)
+        self.counts = pd.Series(dtype='float64')
+        self.errors = pd.Series(dtype='float64')
+        self.floor = 0.0
+        self.total = 0.0
+
+    def update(self, items, weights=None):
+        """
+        Adds a batch of items (optionally weighted). The batch is aggregated
+        with a vectorized groupby and merged as an exact partial summary.
+        """
+        items = pd.Series(items)
+        if weights is None:
+            weights = pd.Series(1.0, index=items.index)
+        else:
+            weights = pd.Series(np.asarray(weights, dtype='float64'), index=items.index)
+
+        mask = items.notna()
+        batch = weights[mask].groupby(items[mask].values).sum()
+        self.merge(SpaceSaving._from_counts(batch, self.capacity))
+        return self
+
+    def merge(self, other):
+        """
+        Merges another summary in place (Agarwal et al. mergeable summaries).
+        Items missing from one side are charged that side's floor.
+        """
+        keys = self.counts.index.union(other.counts.index)
+        counts = (self.counts.reindex(keys, fill_value=self.floor)
+                  + other.counts.reindex(keys, fill_value=other.floor))
+        errors = (self.errors.reindex(keys, fill_value=self.floor)
+                  + other.errors.reindex(keys, fill_value=other.floor))
+
+        counts = counts.sort_values(ascending=False, kind='stable')
+        kept = counts.index[:self.capacity]
+        dropped_max = counts.iloc[self.capacity] if len(counts) > self.capacity else 0.0
+
+        self.counts = counts.loc[kept]
+        self.errors = errors.loc[kept]
+        self.floor = max(self.floor + other.floor, dropped_max)
+        self.total += other.total
+        return self
+
+    def top(self, k):
+        """Returns the k heaviest items as a Series sorted descending."""
+        return self.counts.head(k).copy()
+
+    def guaranteed(self, k):
+        """
+        Flags which of the reported top-k are certainly above every item
+        outside the summary (lower bound beats the floor).
+        """
+        lower = (self.counts - self.errors).head(k)
+        return lower >= self.floor
+
+    @classmethod
+    def _from_counts(cls, counts, capacity):
+        counts = counts.sort_values(ascending=False, kind='stable')
+        summary = cls(capacity)
+        summary.counts = counts.head(capacity).astype('float64')
+        summary.errors = pd.Series(0.0, index=summary.counts.index)
+        summary.floor = float(counts.iloc[capacity]) if len(counts) > capacity else 0.0
+        summary.total = float(counts.sum())
+        return summary
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch for point estimates of any item's weight.
+    Estimates never undercount; overcount is bounded by eps * total with
+    probability 1 - delta (width = e / eps, depth = ln(1 / delta)).
+    """
+
+    _PRIME = np.uint64((1 << 31) - 1)
+
+    def __init__(self, width=2048, depth=5, seed=42):
+        self.width = int(width)
+        self.depth = int(depth)
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, (1 << 31) - 1, size=depth, dtype=np.uint64)
+        self._b = rng.integers(0, (1 << 31) - 1, size=depth, dtype=np.uint64)
+        self.table = np.zeros((self.depth, self.width), dtype='float64')
+        self.total = 0.0
+
+    def _buckets(self, items):
+        hashed = pd.util.hash_array(np.asarray(items, dtype=object)) % self._PRIME
+        return ((self._a[:, None] * hashed[None, :] + self._b[:, None]) % self._PRIME) % np.uint64(self.width)
+
+    def update(self, items, weights=None):
+        items = pd.Series(items)
+        if weights is None:
+            weights = pd.Series(1.0, index=items.index)
+        else:
+            weights = pd.Series(np.asarray(weights, dtype='float64'), index=items.index)
+
+        mask = items.notna()
+        batch = weights[mask].groupby(items[mask].values).sum()
+        if batch.empty:
+            return self
+
+        buckets = self._buckets(batch.index.values)
+        for row in range(self.depth):
+            np.add.at(self.table[row], buckets[row].astype(np.intp), batch.values)
+        self.total += float(batch.sum())
+        return self
+
+    def merge(self, other):
+        if (other.width, other.depth, other.seed) != (self.width, self.depth, self.seed):
+            raise ValueError("Count-Min sketches must share width, depth and seed to be merged.")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def estimate(self, items):
+        """Upper-bound weight estimate for each item."""
+        buckets = self._buckets(items).astype(np.intp)
+        rows = np.arange(self.depth)[:, None]
+        return pd.Series(self.table[rows, buckets].min(axis=0), index=pd.Index(items))
+
+
+class HeavyHitters:
+    """
+    Incremental Top-K tracker: a Space-Saving summary for candidate ranking
+    plus a Count-Min sketch for point lookups. Feed it batches as they
+    arrive and merge trackers built on separate partitions.
+    """
+
+    def __init__(self, capacity=1000, width=2048, depth=5, seed=42):
+        self.summary = SpaceSaving(capacity)
+        self.sketch = CountMinSketch(width, depth, seed)
+
+    def update(self, items, weights=None):
+        self.summary.update(items, weights)
+        self.sketch.update(items, weights)
+        return self
+
+    def merge(self, other):
+        self.summary.merge(other.summary)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def top(self, k):
+        """
+        Top-k by Space-Saving, each count tightened with the Count-Min
+        estimate (both are upper bounds, so the min is still one).
+        """
+        top = self.summary.top(k)
+        if top.empty:
+            return top
+        return np.minimum(top, self.sketch.estimate(top.index.values).values).sort_values(ascending=False)
+
+    def estimate(self, items):
+        return self.sketch.estimate(items)
+
+
+def stream_heavy_hitters(con, target, metric='watch_time_minutes', table='video_events',
+                         capacity=1000, batch_vectors=64, tracker=None):
+    """
+    Streams (item, weight) batches out of DuckDB into a HeavyHitters tracker
+    without materializing the full column. Pass an existing `tracker` to
+    keep maintaining it as new data arrives.
+    """
+    tracker = tracker if tracker is not None else HeavyHitters(capacity)
+    result = con.execute(f'SELECT "{target}" AS item, "{metric}" AS weight FROM {table}')
+    while True:
+        chunk = result.fetch_df_chunk(batch_vectors)
+        if chunk.empty:
+            break
+        tracker.update(chunk['item'], chunk['weight'].fillna(0))
+    return tracker
@@ -0,0 +1,93 @@
+"""
+Batch report check: the parallel CLI must write, for every workbook, event
+store and directory of workbooks, the same insights an in-process engine
+computes, Parquet tables for the tabular ones, and a summary that records
+a failing input without losing the others. Exit 1 on failure.
+
+    python verify_batch_report.py
+    python verify_batch_report.py --workers 4
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import warnings
+
+import duckdb
+from sklearn.exceptions import ConvergenceWarning
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+from batch_report import main as batch_main
+from insights import compute_insights, to_jsonable
+from storage import write_event_store
+
+WORKBOOKS = ('autogravity_dataset.xlsx', 'dataset_custom.xlsx', 'dataset_espanol.xlsx')
+
+
+def expected_insights(path):
+    if os.path.isdir(path):
+        ae = AnalyticsEngine.from_event_store(path)
+    else:
+        ae = AnalyticsEngine(load_data(path)['dataset'])
+    insights = compute_insights(ae)
+    tables = {key: len(value) for key, value in insights.items() if hasattr(value, 'empty') and not value.empty}
+    return json.loads(json.dumps(to_jsonable(insights))), tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if batch reports disagree with in-process insights.")
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args(argv)
+    # The small workbooks have fewer distinct points than clusters
+    warnings.simplefilter('ignore', ConvergenceWarning)
+
+    check = Checks(52)
+    with tempfile.TemporaryDirectory() as tmp:
+        # A workbook, a directory of workbooks and an event store
+        folder = os.path.join(tmp, 'regional')
+        os.makedirs(folder)
+        for name in WORKBOOKS[1:]:
+            shutil.copy(name, folder)
+        store = write_event_store(load_data(WORKBOOKS[0])['dataset'], os.path.join(tmp, 'store'))
+        sources = [WORKBOOKS[0]] + [os.path.join(folder, name) for name in WORKBOOKS[1:]] + [store]
+
+        out = os.path.join(tmp, 'reports')
+        status = batch_main([WORKBOOKS[0], folder, store, '--output-dir', out,
+                             '--workers', str(args.workers), '--parquet'])
+        with open(os.path.join(out, 'summary.json'), encoding='utf-8') as f:
+            summary = json.load(f)
+        check("every input succeeds", status == 0 and summary['succeeded'] == summary['inputs'] == len(sources),
+              f"{summary['succeeded']} of {summary['inputs']} inputs")
+        check("summary records timings per input",
+              all(set(r['timings']) == {'load_s', 'compute_s', 'write_s', 'total_s'} for r in summary['results'])
+              and 0 < summary['pool_utilization'] <= 1, f"pool utilization {summary['pool_utilization']:.0%}")
+
+        con = duckdb.connect()
+        for source in sources:
+            name = os.path.splitext(os.path.basename(os.path.normpath(source)))[0]
+            with open(os.path.join(out, f"{name}.json"), encoding='utf-8') as f:
+                report = json.load(f)
+            expected, tables = expected_insights(source)
+            check(f"{name}: report equals in-process insights",
+                  report['source'] == source and same(report['insights'], expected))
+            rows = {key: con.execute(f"SELECT COUNT(*) FROM '{os.path.join(out, f'{name}.{key}.parquet')}'").fetchone()[0]
+                    for key in tables if os.path.exists(os.path.join(out, f"{name}.{key}.parquet"))}
+            check(f"{name}: one Parquet table per tabular insight", rows == tables, ', '.join(sorted(rows)))
+
+        # A broken input fails alone
+        failing = os.path.join(tmp, 'failing')
+        status = batch_main(['missing.xlsx', WORKBOOKS[0], '--output-dir', failing,
+                             '--workers', str(args.workers), '--no-clusters'])
+        with open(os.path.join(failing, 'summary.json'), encoding='utf-8') as f:
+            results = {r['source']: r['status'] for r in json.load(f)['results']}
+        check("a failing input exits 1 and spares the others",
+              status == 1 and results == {'missing.xlsx': 'error', WORKBOOKS[0]: 'ok'}, str(results))
+
+    return check.summary("Batch reports match in-process insights.", "batch report")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
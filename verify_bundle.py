@@ -0,0 +1,113 @@
+"""
+Bundle check: a published bundle opened read-only must answer KPIs,
+region and genre breakdowns, the trend and the sidebar choices like an
+engine with the same filters, carry the published view's other insights,
+and reject other formats, newer versions and filters it cannot serve.
+Exit 1 on failure.
+
+    python verify_bundle.py
+    python verify_bundle.py --data dataset_espanol.xlsx
+"""
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import zipfile
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+from bundle import BUNDLE_VERSION, CUBE_DIMENSIONS, Bundle, build_bundle
+from insights import compute_insights, to_jsonable
+
+
+def answers(ae):
+    """What the app's pages read from an engine or a BundleView."""
+    return {
+        'kpis': ae.get_kpis(),
+        'geo': ae.get_geographic_stats(),
+        'genres': ae.get_content_intelligence()['top_genres'],
+        'trend': ae.get_time_series(),
+    }
+
+
+def rejected(action):
+    try:
+        action()
+    except ValueError:
+        return True
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if bundles disagree with the engine they publish.")
+    parser.add_argument('--data', default='autogravity_dataset.xlsx')
+    args = parser.parse_args(argv)
+
+    df = load_data(args.data)['dataset']
+    dims = [d for d in CUBE_DIMENSIONS if d in df.columns]
+    month = df['timestamp'].median().to_period('M')
+    views = {'whole dataset': ({}, None),
+             f"{dims[0]} in {month}": ({dims[0]: df[dims[0]].dropna().iloc[0]},
+                                      (month.start_time.date(), month.end_time.date()))}
+    check = Checks(60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (filters, date_range) in views.items():
+            ae = AnalyticsEngine(df, filters=filters, date_range=date_range)
+            path = os.path.join(tmp, f"{len(os.listdir(tmp))}.tva.zip")
+            manifest = build_bundle(ae, path, source=args.data)
+            bundle = Bundle.load(path)
+            view = bundle.view()
+
+            check(f"{name}: manifest describes the view",
+                  manifest['filters'] == ae.filters and bundle.manifest['version'] == BUNDLE_VERSION
+                  and bundle.manifest['tables'] == {t: len(table) for t, table in bundle.tables.items()}
+                  and not [f for f in os.listdir(tmp) if '.tmp-' in f])
+            published = json.loads(json.dumps(to_jsonable(compute_insights(ae))))
+            check(f"{name}: published insights equal the engine's",
+                  same({k: v for k, v in published.items() if k in bundle.insights}, bundle.insights)
+                  and same(view.get_top_content_ranking(k=3), ae.get_top_content_ranking(k=3))
+                  and same(view.get_sai(), ae.get_sai()))
+            check(f"{name}: sidebar choices equal the engine's",
+                  all(same(view.get_distinct_values(d), sorted(ae.con.execute(
+                      f'SELECT DISTINCT "{d}" FROM video_events WHERE "{d}" IS NOT NULL').df()[d].tolist()))
+                      for d in dims))
+
+            # Every single-value filter of one or two cube dimensions
+            values = {d: bundle.tables['cube'].loc[~bundle.tables['cube'][f'all_{d}'], d].dropna().unique()[:2]
+                      for d in dims if d not in filters}
+            selections = [{}] + [{d: v} for d in values for v in values[d]] + [
+                {a: values[a][0], b: values[b][0]} for a, b in itertools.combinations(values, 2)]
+            differing = []
+            for selection in selections:
+                expected = answers(ae.filtered(filters={**ae.filters, **selection}, date_range=date_range))
+                got = answers(bundle.view(selection))
+                differing += [f"{selection} {k}" for k in expected if not same(expected[k], got[k])]
+            check(f"{name}: filtered views equal filtered engines", not differing,
+                  ', '.join(differing[:3]) or f"{len(selections)} selections")
+
+        listed = next(iter(values))
+        check("list and date filters are refused",
+              rejected(lambda: bundle.view({listed: list(values[listed])}))
+              and rejected(lambda: bundle.view({'segment': 'x'}))
+              and rejected(lambda: view.filtered(date_range=('2025-01-01', '2025-01-31'))))
+
+        # Other formats and newer versions are refused on load
+        for label, change in (('other format', {'format': 'something-else'}),
+                              ('newer version', {'version': BUNDLE_VERSION + 1})):
+            forged = os.path.join(tmp, 'forged.zip')
+            with zipfile.ZipFile(path) as source, zipfile.ZipFile(forged, 'w') as target:
+                for item in source.namelist():
+                    content = source.read(item)
+                    if item == 'manifest.json':
+                        content = json.dumps({**json.loads(content), **change})
+                    target.writestr(item, content)
+            check(f"{label} is refused on load", rejected(lambda: Bundle.load(forged)))
+
+    return check.summary("Bundles match the engines they publish.", "bundle")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
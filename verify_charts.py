@@ -0,0 +1,105 @@
+"""
+Chart payload check: LTTB must keep the endpoints and spikes and return
+exactly the requested points, DuckDB binning must account for every
+non-null row within bins x bins cells, and stratified samples must cover
+every stratum at about the requested size. Exit 1 on failure.
+
+    python verify_charts.py
+    python verify_charts.py --rows 5000000
+"""
+import argparse
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from checks import Checks
+from charts import binned_density, downsample_series, lttb, stratified_sample
+
+
+def events(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    regions = rng.choice(['North', 'South', 'East', 'West', 'Central', 'Antarctica'], rows,
+                         p=[0.3, 0.3, 0.2, 0.1, 0.0999, 0.0001])
+    watch = rng.gamma(2.0, 15.0, rows)
+    df = pd.DataFrame({
+        'user_id': rng.integers(0, rows // 10, rows),
+        'region': regions,
+        'device': rng.choice(['Mobile', 'TV', 'Web'], rows),
+        'watch_time_minutes': watch,
+        'completion_rate': np.clip(watch / 60 + rng.normal(0, 0.1, rows), 0, 1),
+    })
+    df.loc[rng.random(rows) < 0.01, 'completion_rate'] = np.nan
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if chart reductions lose their guarantees.")
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--points', type=int, default=1_000)
+    parser.add_argument('--bins', type=int, default=80)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(7)
+    check = Checks()
+
+    # LTTB on a noisy series with one spike up and one down
+    n = 100_000
+    x = np.arange(n, dtype='float64')
+    y = np.sin(x / 5_000) + rng.normal(0, 0.05, n)
+    y[31_337], y[77_777] = 25.0, -25.0
+    keep = lttb(x, y, args.points)
+    check("lttb returns exactly threshold sorted indices",
+          len(keep) == args.points and np.all(np.diff(keep) > 0), f"{len(keep)} points")
+    check("lttb keeps first and last points", keep[0] == 0 and keep[-1] == n - 1)
+    check("lttb keeps the spikes", {31_337, 77_777} <= set(keep.tolist()))
+    check("lttb passes short series through", np.array_equal(lttb(x[:50], y[:50], args.points), np.arange(50)))
+
+    series = pd.DataFrame({'date': pd.date_range('2024-01-01', periods=n, freq='min'), 'value': y})
+    reduced = downsample_series(series, 'date', 'value', args.points)
+    check("downsample_series caps datetime series",
+          len(reduced) == args.points and reduced['value'].max() == 25.0 and reduced['value'].min() == -25.0)
+    short = series.head(10)
+    check("downsample_series passes short frames through", downsample_series(short, 'date', 'value') is short)
+
+    # DuckDB binning and stratified sampling over an event table
+    df = events(args.rows)
+    con = duckdb.connect()
+    con.register('video_events', df)
+
+    bins = binned_density(con, 'video_events', 'watch_time_minutes', 'completion_rate',
+                          color='region', bins=args.bins)
+    complete = df.dropna(subset=['watch_time_minutes', 'completion_rate'])
+    check("binned_density counts every non-null row",
+          bins['count'].sum() == len(complete), f"{bins['count'].sum():,} of {len(complete):,}")
+    check("binned_density stays within bins x bins",
+          len(bins) <= args.bins ** 2, f"{len(bins):,} cells")
+    check("binned_density centres lie inside the data range",
+          bins['watch_time_minutes'].between(complete['watch_time_minutes'].min(),
+                                             complete['watch_time_minutes'].max()).all()
+          and bins['completion_rate'].between(complete['completion_rate'].min(),
+                                              complete['completion_rate'].max()).all()
+          and bins['region'].notna().all())
+
+    target = 5_000
+    sample = stratified_sample(con, 'video_events', ['user_id', 'watch_time_minutes', 'completion_rate'],
+                               'region', n=target, min_per_stratum=50)
+    sizes = df['region'].value_counts()
+    picked = sample['region'].value_counts().reindex(sizes.index, fill_value=0)
+    check("stratified_sample represents every stratum",
+          (picked >= np.minimum(sizes, 50)).all(), f"smallest stratum {picked.min()} of {sizes.min()} rows")
+    check("stratified_sample is about n rows",
+          target * 0.9 <= len(sample) <= target + 50 * len(sizes), f"{len(sample):,} rows for n={target:,}")
+    shares = (picked / len(sample) - sizes / len(df)).abs()
+    check("stratified_sample keeps large strata proportional",
+          shares[sizes > 0.05 * len(df)].max() < 0.02, f"max share drift {shares.max():.4f}")
+    again = stratified_sample(con, 'video_events', ['user_id', 'watch_time_minutes', 'completion_rate'],
+                              'region', n=target, min_per_stratum=50)
+    check("stratified_sample is deterministic for a seed", sample.sort_values(list(sample.columns))
+          .reset_index(drop=True).equals(again.sort_values(list(again.columns)).reset_index(drop=True)))
+
+    return check.summary("Chart reductions within their caps.", "chart")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+"""
+Cohort check: the DuckDB cohort grid must equal a pandas rebuild (cohort =
+first unfiltered activity, counted activity = filtered events), users must
+keep their cohort under every filter, and incremental updates must equal a
+one-shot build. Exit 1 on failure.
+
+    python verify_cohorts.py
+    python verify_cohorts.py --data dataset_custom.xlsx
+"""
+import argparse
+
+import pandas as pd
+
+from checks import Checks
+from etl import load_data
+from analytics import AnalyticsEngine
+from cohorts import CohortMatrix
+
+
+def truncate(ts, period):
+    return ts.dt.to_period('M' if period == 'month' else 'W-SUN').dt.start_time
+
+
+def pandas_grid(df, filtered, period):
+    """Active users per cohort x period_number, rebuilt in pandas."""
+    events = df.dropna(subset=['user_id', 'timestamp'])
+    cohort = truncate(events.groupby('user_id')['timestamp'].min(), period)
+    active = filtered.dropna(subset=['user_id', 'timestamp'])
+    active = active.assign(period=truncate(active['timestamp'], period))
+    active = active.assign(cohort=active['user_id'].map(cohort))
+    if period == 'month':
+        number = ((active['period'].dt.year - active['cohort'].dt.year) * 12
+                  + active['period'].dt.month - active['cohort'].dt.month)
+    else:
+        number = (active['period'] - active['cohort']).dt.days // 7
+    grid = active.assign(period_number=number).groupby(['cohort', 'period_number'])['user_id'].nunique()
+    return grid.unstack('period_number'), cohort
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if cohort grids differ from pandas.")
+    parser.add_argument('--data', default='autogravity_dataset.xlsx')
+    args = parser.parse_args(argv)
+
+    df = load_data(args.data)['dataset']
+    check = Checks(58)
+
+    start = df['timestamp'].min()
+    selections = [({}, None), ({'region': df['region'].iloc[0]}, None), ({'device': df['device'].iloc[0]}, None),
+                  ({}, ((start + pd.Timedelta(days=30)).date(), (start + pd.Timedelta(days=90)).date()))]
+    for period in ('month', 'week'):
+        for filters, date_range in selections:
+            ae = AnalyticsEngine(df, filters=filters, date_range=date_range)
+            matrix = ae.get_cohorts(period, by=('region',))
+            filtered = ae.con.execute("SELECT * FROM video_events").df()
+            expected, cohort = pandas_grid(df, filtered, period)
+            grid = matrix.matrix('active_users', max_periods=10_000)
+            label = ' '.join([period] + [str(filters)] * bool(filters) + ['+ dates'] * bool(date_range))
+            check(f"{label}: active users equal pandas",
+                  grid.shape == expected.shape and (grid.fillna(0).to_numpy() == expected.fillna(0).to_numpy()).all())
+            users = matrix.users.set_index('user_id')['cohort']
+            check(f"{label}: users keep their unfiltered cohort",
+                  (users == cohort.reindex(users.index)).all())
+
+        unfiltered = AnalyticsEngine(df).get_cohorts(period, by=('region',))
+        retention = unfiltered.matrix('retention')
+        check(f"{period}: unfiltered period 0 retention is 100%", (retention[0].round(9) == 100).all())
+        check(f"{period}: cohort sizes add up to distinct users",
+              unfiltered.cohort_sizes().sum() == df['user_id'].nunique())
+
+    # Incremental updates equal a one-shot build; overlapping batches are rejected
+    ae = AnalyticsEngine(df)
+    cut = df['timestamp'].quantile(0.5).to_period('M').start_time
+    ae.con.execute(f"CREATE TEMP VIEW first_half AS SELECT * FROM events_source WHERE timestamp < TIMESTAMP '{cut}'")
+    ae.con.execute(f"CREATE TEMP VIEW second_half AS SELECT * FROM events_source WHERE timestamp >= TIMESTAMP '{cut}'")
+    incremental = CohortMatrix('month', ['region']).update(ae.con, 'first_half').update(ae.con, 'second_half')
+    one_shot = CohortMatrix.from_engine(ae, 'month', ['region'])
+    check("incremental updates equal a one-shot build",
+          incremental.matrix('retention').equals(one_shot.matrix('retention')))
+    try:
+        incremental.update(ae.con, 'second_half')
+        check("re-counted periods are rejected", False)
+    except ValueError:
+        check("re-counted periods are rejected", True)
+
+    return check.summary("Cohort grids match pandas.", "cohort")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
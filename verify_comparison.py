@@ -0,0 +1,111 @@
+"""
+Period comparison check: for day, week, month and custom windows, overall
+and per dimension, the current and previous values must equal the KPIs of
+engines filtered to each window, the deltas must follow from them, and an
+event store engine (and one already limited to the current window) must
+report the same rows. Exit 1 on failure.
+
+    python verify_comparison.py
+    python verify_comparison.py --data dataset_espanol.xlsx
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine, COMPARISON_MEASURES, PERIOD_OFFSETS
+from storage import write_event_store
+
+
+def windows(period, latest):
+    """(current, previous) as inclusive (start, end) dates, like get_period_comparison."""
+    if isinstance(period, str):
+        start = latest.normalize() if period == 'day' else latest.to_period(period[0].upper()).start_time
+        end = start + PERIOD_OFFSETS[period]
+        previous = start - PERIOD_OFFSETS[period]
+    else:
+        start, end = pd.Timestamp(period[0]), pd.Timestamp(period[1]) + pd.Timedelta(days=1)
+        previous = start - (end - start)
+    day = pd.Timedelta(days=1)
+    return (start.date(), (end - day).date()), (previous.date(), (start - day).date())
+
+
+def expected_rows(df, filters, period, dimension):
+    """One row per dimension value from two engines filtered to each window."""
+    latest = AnalyticsEngine(df, filters=filters).get_time_bounds()[1]
+    current, previous = windows(period, latest)
+    values = [None] if dimension is None else sorted(df[dimension].dropna().unique())
+    rows = {}
+    for value in values:
+        scoped = dict(filters, **({dimension: value} if dimension else {}))
+        now = AnalyticsEngine(df, filters=scoped, date_range=current)
+        if now.con.execute("SELECT COUNT(*) FROM video_events").fetchone()[0] == 0:
+            continue
+        before = AnalyticsEngine(df, filters=scoped, date_range=previous)
+        has_before = before.con.execute("SELECT COUNT(*) FROM video_events").fetchone()[0] > 0
+        kpis, prev = now.get_kpis(), before.get_kpis()
+        row = {}
+        for m in COMPARISON_MEASURES:
+            row[m] = kpis[m]
+            row[f'previous_{m}'] = prev[m] if has_before else None
+        rows[value] = row
+    return rows, current
+
+
+def actual_rows(result, dimension):
+    return {(row[dimension] if dimension else None): {m: row[m] for m in COMPARISON_MEASURES}
+            | {f'previous_{m}': row[f'previous_{m}'] for m in COMPARISON_MEASURES}
+            for row in result.to_dict(orient='records')}
+
+
+def deltas_consistent(result):
+    for m in COMPARISON_MEASURES:
+        delta = result[m] - result[f'previous_{m}']
+        pct = delta * 100 / result[f'previous_{m}'].replace(0, np.nan)
+        if not (same(result[f'{m}_delta'].tolist(), delta.tolist())
+                and same(result[f'{m}_delta_pct'].tolist(), pct.tolist())):
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if period comparisons disagree with filtered KPIs.")
+    parser.add_argument('--data', default='autogravity_dataset.xlsx')
+    args = parser.parse_args(argv)
+
+    df = load_data(args.data)['dataset']
+    start, end = df['timestamp'].min(), df['timestamp'].max()
+    middle = (start + (end - start) / 2).normalize()
+    custom = ((middle - pd.Timedelta(days=13)).date(), middle.date())
+    device = df['device'].dropna().iloc[0] if 'device' in df.columns else None
+    cases = [('month', None, {}), ('week', 'region', {}), ('day', None, {}), (custom, 'region', {}),
+             ('month', 'region', {'device': device} if device else {})]
+    check = Checks(56)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = write_event_store(df, os.path.join(tmp, 'store'))
+        for period, dimension, filters in cases:
+            label = (period if isinstance(period, str) else f"{period[0]}..{period[1]}") \
+                + (f" by {dimension}" if dimension else "") + ''.join(f" {k}={v}" for k, v in filters.items())
+            expected, current = expected_rows(df, filters, period, dimension)
+            result = AnalyticsEngine(df, filters=filters).get_period_comparison(period, dimension)
+            check(f"{label}: equals filtered KPIs", same(actual_rows(result, dimension), expected),
+                  f"{len(result)} row(s)")
+            check(f"{label}: deltas follow from the values", deltas_consistent(result))
+
+            store = AnalyticsEngine.from_event_store(root, filters=filters).get_period_comparison(period, dimension)
+            # An engine limited to the current window still sees the previous one
+            latest = AnalyticsEngine(df, filters=filters).get_time_bounds()[1]
+            windowed = AnalyticsEngine(df, filters=filters, date_range=current).get_period_comparison(
+                period, dimension, current=latest)
+            check(f"{label}: store and windowed engines agree", same(store, result) and same(windowed, result))
+
+    return check.summary("Period comparisons match filtered KPIs.", "comparison")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+"""
+Event store check: an engine over the Hive-partitioned Parquet store must
+answer like the in-memory engine for every filter and date range, region
+and date filters must read only the partitions they select, and rows must
+be sorted by timestamp inside each file. Exit 1 on failure.
+
+    python verify_event_store.py
+    python verify_event_store.py --data dataset_custom.xlsx dataset_espanol.xlsx
+"""
+import argparse
+import os
+import re
+import tempfile
+
+import pandas as pd
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+from storage import write_event_store
+
+# Engine methods compared between the store and the in-memory frame, with
+# the column each one needs
+METHODS = {
+    'get_kpis': None,
+    'get_time_series': 'timestamp',
+    'get_geographic_stats': 'region',
+    'get_device_ratio': 'device',
+    'get_recurrence_metrics': 'user_id',
+}
+
+
+def answers(ae, columns):
+    out = {name: getattr(ae, name)() for name, column in METHODS.items() if column in (None, *columns)}
+    out['ranking'] = ae.get_top_content_ranking(k=10)
+    return out
+
+
+def files_read(ae):
+    """Parquet files DuckDB opened to scan video_events."""
+    plan = ae.con.execute("EXPLAIN ANALYZE SELECT * FROM video_events").fetchall()[0][1]
+    return sum(int(n) for n in re.findall(r'Total Files Read: (\d+)', plan))
+
+
+def partitions(df, filters, date_range):
+    """Month x region partitions holding rows of the selection."""
+    keep = pd.Series(True, index=df.index)
+    if 'region' in filters:
+        keep &= df['region'] == filters['region']
+    months = df['timestamp'].dt.to_period('M')
+    if date_range:
+        keep &= months.between(pd.Period(date_range[0], 'M'), pd.Period(date_range[1], 'M'))
+    return len(pd.DataFrame({'month': months, 'region': df['region']})[keep].drop_duplicates())
+
+
+def describe(filters, date_range):
+    parts = [f"{col}={value}" for col, value in filters.items()]
+    if date_range:
+        parts.append(f"{date_range[0]}..{date_range[1]}")
+    return ' '.join(parts) or 'unfiltered'
+
+
+def selections(df):
+    """Unfiltered, one value of each dimension, the middle month, and a region in that month."""
+    out = [({}, None)]
+    dims = [c for c in ('region', 'device') if c in df.columns]
+    for dim in dims:
+        out.append(({dim: df[dim].dropna().iloc[0]}, None))
+    if df['timestamp'].notna().any():
+        start, end = df['timestamp'].min(), df['timestamp'].max()
+        month = (start + (end - start) / 2).to_period('M')
+        days = (month.start_time.date(), month.end_time.date())
+        out.append(({}, days))
+        if dims:
+            out.append(({dims[0]: df[dims[0]].dropna().iloc[0]}, days))
+    return out
+
+
+def check_store(check, name, df):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = write_event_store(df, os.path.join(tmp, 'store'))
+        files = [os.path.relpath(os.path.join(d, f), root) for d, _, names in os.walk(root)
+                 for f in names if f.endswith('.parquet')]
+        months = df['timestamp'].dt.strftime('%Y-%m').dropna().unique()
+        check(f"{name}: one directory per month x region",
+              all(re.fullmatch(r'month=\d{4}-\d{2}/region=[^/]+/data_0\.parquet', f.replace(os.sep, '/')) for f in files)
+              and {f.split(os.sep)[0] for f in files} == {f'month={m}' for m in months}, f"{len(files)} files")
+
+        for filters, date_range in selections(df):
+            label = f"{name}: {describe(filters, date_range)}"
+            store = AnalyticsEngine.from_event_store(root, filters=filters, date_range=date_range)
+            memory = AnalyticsEngine(df, filters=filters, date_range=date_range)
+            expected, got = answers(memory, df.columns), answers(store, df.columns)
+            differing = [method for method in expected if not same(expected[method], got[method])]
+            check(f"{label}: store equals in-memory", not differing, ', '.join(differing))
+            if 'region' in filters or date_range:
+                read, wanted = files_read(store), partitions(df, filters, date_range)
+                check(f"{label}: only selected partitions read", read == wanted,
+                      f"{read} of {len(files)} files read, {wanted} selected")
+
+        # Sorted by timestamp inside each file, so row-group min/max stay tight
+        unordered = AnalyticsEngine.from_event_store(root).con.execute(f"""
+        SELECT count(*) FILTER (WHERE NOT ordered) FROM (
+            SELECT timestamp >= LAG(timestamp) OVER (PARTITION BY filename ORDER BY file_row_number) AS ordered
+            FROM read_parquet('{os.path.join(root, '**', '*.parquet')}', filename = true, file_row_number = true)
+        )""").fetchone()[0]
+        check(f"{name}: rows sorted by timestamp inside each file", unordered == 0,
+              f"{unordered} rows out of order" if unordered else "")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if the Parquet event store disagrees with the frame.")
+    parser.add_argument('--data', nargs='+',
+                        default=['autogravity_dataset.xlsx', 'dataset/Datos de Streaming en México.xlsx'])
+    args = parser.parse_args(argv)
+
+    check = Checks(64)
+    for path in args.data:
+        check_store(check, os.path.splitext(os.path.basename(path))[0], load_data(path)['dataset'])
+    return check.summary("Event store matches the in-memory engine.", "event store")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
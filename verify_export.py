@@ -0,0 +1,101 @@
+"""
+Export check: xlsx, parquet and csv reports of a filtered engine must hold
+exactly the engine's events, ranking and insight tables, report the rows
+they wrote, and roll Excel sheets over at the row limit without losing or
+repeating rows. Exit 1 on failure.
+
+    python verify_export.py
+    python verify_export.py --data dataset_espanol.xlsx --sheet-rows 50
+"""
+import argparse
+import os
+import tempfile
+
+import duckdb
+import pandas as pd
+from openpyxl import load_workbook
+
+import export
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+
+
+def read_sheets(path):
+    """{sheet name: DataFrame} of a written workbook (header row as columns)."""
+    workbook = load_workbook(path, read_only=True)
+    sheets = {}
+    for ws in workbook.worksheets:
+        rows = list(ws.iter_rows(values_only=True))
+        sheets[ws.title] = pd.DataFrame(rows[1:], columns=rows[0])
+    workbook.close()
+    return sheets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if exported reports disagree with the engine.")
+    parser.add_argument('--data', default='autogravity_dataset.xlsx')
+    parser.add_argument('--sheet-rows', type=int, default=400, help="Excel row limit for the rollover check")
+    args = parser.parse_args(argv)
+
+    df = load_data(args.data)['dataset']
+    region = df['region'].dropna().iloc[0]
+    ae = AnalyticsEngine(df, filters={'region': region})
+    events = ae.con.execute("SELECT * FROM video_events").df()
+    target = ae._content_target()
+    ranking = ae.get_top_content_ranking()
+    # Columns compared after the xlsx round trip
+    columns = ['user_id', target, 'watch_time_minutes']
+    check = Checks(52)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        con = duckdb.connect()
+        for fmt in ('parquet', 'csv'):
+            out = os.path.join(tmp, fmt)
+            written = export.export_report(ae, out, fmt)
+            files = {name: os.path.join(out, f"{name.lower().replace(' ', '_')}.{fmt}") for name in written}
+            rows = {name: con.execute(f"SELECT COUNT(*) FROM '{path}'").fetchone()[0] for name, path in files.items()}
+            check(f"{fmt}: returned row counts match the files", rows == written,
+                  ', '.join(f"{name} {n:,}" for name, n in written.items()))
+            check(f"{fmt}: events are the filtered events", written.get('Events') == len(events))
+            exported = con.execute(f"SELECT * FROM '{files['Ranking']}'").df()
+            check(f"{fmt}: ranking equals the engine's", same(
+                exported.set_index(target)['total_watch_time'].to_dict(), ranking.to_dict()))
+        parquet_events = con.execute(f"SELECT * FROM '{os.path.join(tmp, 'parquet', 'events.parquet')}'").df()
+        check("parquet: events round-trip unchanged", same(parquet_events, events))
+
+        path = os.path.join(tmp, 'report.xlsx')
+        written = export.export_report(ae, path)
+        sheets = read_sheets(path)
+        check("xlsx: one sheet per insight with its rows",
+              {name: len(sheets[name]) for name in written} == written, ', '.join(sheets))
+        check("xlsx: events are the filtered events", same(sheets['Events'][columns], events[columns]))
+
+        # Excel rollover at a small row limit: '<name> (2)', ... hold the rest
+        limit, export.EXCEL_MAX_ROWS = export.EXCEL_MAX_ROWS, args.sheet_rows
+        try:
+            path = os.path.join(tmp, 'rolled.xlsx')
+            written = export.export_report(ae, path, include_clusters=False)
+        finally:
+            export.EXCEL_MAX_ROWS = limit
+        sheets = read_sheets(path)
+        parts = [name for name in sheets if name == 'Events' or name.startswith('Events (')]
+        rolled = pd.concat([sheets[name] for name in parts], ignore_index=True)
+        check("xlsx: events roll over at the row limit",
+              len(parts) == -(-len(events) // (args.sheet_rows - 1))
+              and all(len(sheets[name]) <= args.sheet_rows - 1 for name in parts)
+              and len(rolled) == written['Events'] == len(events), f"{len(parts)} sheets")
+        check("xlsx: rolled sheets keep every row once", same(rolled[columns], events[columns]))
+
+        try:
+            export.export_report(ae, os.path.join(tmp, 'report.json'), 'json')
+            rejected = False
+        except ValueError:
+            rejected = True
+        check("unsupported format raises ValueError", rejected)
+
+    return check.summary("Exports match the engine.", "export")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
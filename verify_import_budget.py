@@ -0,0 +1,99 @@
+"""
+Cold-start budget check: imports each entry-point module in a fresh
+interpreter with `-X importtime` and fails (exit 1) when one is over its
+budget or pulls in a heavy dependency that should only load on first use.
+app.py is a Streamlit script, so its import statements are run instead of
+the script itself.
+
+    python verify_import_budget.py
+    python verify_import_budget.py --budget-ms 600 --repeat 5
+"""
+import argparse
+import ast
+import subprocess
+import sys
+
+from checks import Checks
+
+# Entry points and their cold import budget in milliseconds
+MODULES = {
+    'etl': 700,
+    'analytics': 800,
+    'insights': 800,
+    'simulation': 500,
+    'export': 800,
+    'service': 800,
+    'batch_report': 800,
+    'bundle': 800,
+    'storage': 300,
+    'charts': 500,
+    'prefetch': 100,
+    'app': 800,
+}
+# Only loaded by clustering, survival analysis and the Plotly charts
+LAZY_DEPENDENCIES = ('sklearn', 'lifelines', 'scipy', 'plotly', 'matplotlib')
+
+
+def app_imports(path='app.py'):
+    """app.py's top-level import statements, as source."""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    return [ast.get_source_segment(source, node) for node in ast.parse(source).body
+            if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def measure_app():
+    """
+    Time (ms) of app.py's imports and the heavy packages they loaded.
+    Streamlit is imported before timing: it loads Plotly itself for its
+    chart theme, which app.py cannot avoid.
+    """
+    probe = "\n".join([
+        "import sys, time",
+        "import streamlit",
+        f"preloaded = {{m for m in {LAZY_DEPENDENCIES!r} if m in sys.modules}}",
+        "start = time.perf_counter()",
+        *app_imports(),
+        "print((time.perf_counter() - start) * 1000)",
+        f"print(','.join(m for m in {LAZY_DEPENDENCIES!r} if m in sys.modules and m not in preloaded))",
+    ])
+    result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True)
+    elapsed, loaded = (result.stdout.splitlines() + [''])[:2]
+    return float(elapsed), [m for m in loaded.split(',') if m]
+
+
+def measure(module):
+    """Cumulative import time (ms) of `module` and the heavy packages it loaded."""
+    probe = f"import sys, {module}; print(','.join(m for m in {LAZY_DEPENDENCIES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe],
+                            capture_output=True, text=True, check=True)
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    loaded = [m for m in result.stdout.strip().split(',') if m]
+    return cumulative_us / 1000, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if cold-start import time regresses.")
+    parser.add_argument('--budget-ms', type=float, help="Override every module's budget")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per module (best one counts)")
+    args = parser.parse_args(argv)
+
+    check = Checks(14)
+    for module, budget in MODULES.items():
+        budget = args.budget_ms or budget
+        runs = [measure_app() if module == 'app' else measure(module) for _ in range(args.repeat)]
+        best = min(ms for ms, _ in runs)
+        loaded = runs[0][1]
+        eager = f"  eagerly imports {', '.join(loaded)}" if loaded else ""
+        check(module, not loaded and best <= budget, f"{best:7.0f}ms / {budget:.0f}ms{eager}")
+
+    return check.summary("All entry points within their cold-start budget.", "cold-start")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
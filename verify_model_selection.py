@@ -0,0 +1,84 @@
+"""
+Cluster count check: on blobs with a known number of clusters, select_k
+must pick it in-process and on the process pool alike, stop early once the
+silhouette stalls, score at least one k within a zero time budget, keep
+its cost bounded by the sample, and drive perform_clustering('auto').
+Exit 1 on failure.
+
+    python verify_model_selection.py
+    python verify_model_selection.py --rows 2000000 --workers 4
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.datasets import make_blobs
+
+from checks import Checks, same
+from analytics import AnalyticsEngine
+from model_selection import select_k
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if select_k misses the cluster count or its budget.")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--clusters', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    check = Checks(52)
+    X, _ = make_blobs(n_samples=args.rows, centers=args.clusters, n_features=3, cluster_std=0.6, random_state=7)
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+
+    serial = select_k(X, sample_size=5_000, max_workers=1, time_budget=60)
+    pooled = select_k(X, sample_size=5_000, max_workers=args.workers, time_budget=60)
+    check("picks the true cluster count", serial['k'] == args.clusters,
+          f"k={serial['k']} (elbow {serial['elbow_k']}, {serial['stopped']})")
+    # Waves of workers may score a few more k before stopping early
+    common = serial['scores'].index.intersection(pooled['scores'].index)
+    metrics = ['inertia', 'silhouette', 'davies_bouldin']
+    check("process pool scores like in-process",
+          pooled['k'] == serial['k'] and len(common) == len(serial['scores'])
+          and same(pooled['scores'].loc[common, metrics], serial['scores'].loc[common, metrics]),
+          f"scored k={list(pooled['scores'].index)}")
+
+    # The silhouette peaks at the true k, so later k stop the search
+    stopped = select_k(X, k_values=range(2, 13), sample_size=5_000, patience=2, max_workers=1, time_budget=60)
+    check("stops once the silhouette stalls",
+          stopped['stopped'] == 'early_stop' and stopped['scores'].index.max() < 12,
+          f"scored k={list(stopped['scores'].index)}")
+
+    start = time.perf_counter()
+    rushed = select_k(X, sample_size=5_000, max_workers=args.workers, time_budget=0)
+    check("zero time budget still scores one k", rushed['stopped'] == 'time_budget' and len(rushed['scores']) >= 1,
+          f"{len(rushed['scores'])} k in {time.perf_counter() - start:.2f}s")
+
+    # The cost follows the sample, not the rows
+    small = select_k(X[:20_000], sample_size=5_000, max_workers=1, time_budget=60)
+    check("cost bounded by the sample",
+          serial['scores']['fit_s'].sum() < 3 * small['scores']['fit_s'].sum() + 1,
+          f"{serial['scores']['fit_s'].sum():.2f}s for {args.rows:,} rows vs "
+          f"{small['scores']['fit_s'].sum():.2f}s for 20,000")
+
+    try:
+        select_k(X[:2])
+        rejected = False
+    except ValueError:
+        rejected = True
+    check("too few rows raises ValueError", rejected)
+
+    # Engine integration: 'auto' clusters with the selected k
+    df = pd.DataFrame(X[:20_000] * [20, 0.2, 30] + [40, 0.6, 60],
+                      columns=['watch_time_minutes', 'completion_rate', 'content_duration_minutes'])
+    ae = AnalyticsEngine(df)
+    clustered, _ = ae.perform_clustering(n_clusters='auto')
+    check("perform_clustering('auto') uses the selected k",
+          ae.k_selection is not None and clustered['cluster'].nunique() == ae.k_selection['k'] == args.clusters,
+          f"k={ae.k_selection and ae.k_selection['k']}")
+
+    return check.summary("select_k finds the cluster count within budget.", "model selection")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
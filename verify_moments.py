@@ -0,0 +1,98 @@
+"""
+Moments check: one-pass mergeable moments (single chunks, batched updates,
+merged partitions and grouped states) must equal pandas, including on
+values with a large offset where naive sums of squares lose precision.
+Exit 1 on failure.
+
+    python verify_moments.py
+    python verify_moments.py --rows 2000000 --chunks 50
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from checks import Checks
+from moments import Moments, GroupedMoments
+
+MEASURES = ['watch_time_minutes', 'completion_rate', 'video_startup_time_sec']
+
+
+def events(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    watch = rng.gamma(2.0, 15.0, rows)
+    df = pd.DataFrame({
+        'region': rng.choice(['North', 'South', 'East', 'West', 'Central'], rows),
+        'device': rng.choice(['Mobile', 'TV', 'Web', None], rows),
+        'watch_time_minutes': watch,
+        'completion_rate': np.clip(watch / 60 + rng.normal(0, 0.1, rows), 0, 1),
+        'video_startup_time_sec': rng.lognormal(0.4, 0.3, rows),
+    })
+    # Missing values are skipped listwise
+    for col in MEASURES:
+        df.loc[rng.random(rows) < 0.01, col] = np.nan
+    return df
+
+
+def chunks_of(df, n):
+    edges = np.linspace(0, len(df), n + 1).astype(int)
+    return [df.iloc[a:b] for a, b in zip(edges[:-1], edges[1:])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if streamed moments differ from pandas.")
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--chunks', type=int, default=17)
+    args = parser.parse_args(argv)
+
+    df = events(args.rows)
+    complete = df.dropna(subset=MEASURES)
+    check = Checks()
+
+    def check_state(name, state, expected):
+        check(name, state.n == len(expected)
+              and np.allclose(state.mean, expected[MEASURES].mean().to_numpy(), rtol=1e-9)
+              and np.allclose(state.variance().to_numpy(), expected[MEASURES].var().to_numpy(), rtol=1e-9)
+              and np.allclose(state.covariance().to_numpy(), expected[MEASURES].cov().to_numpy(), rtol=1e-9)
+              and np.allclose(state.correlation().to_numpy(), expected[MEASURES].corr().to_numpy(), rtol=1e-9),
+              f"{state.n:,} rows")
+
+    chunks = chunks_of(df, args.chunks)
+    check_state("from_array equals pandas", Moments.from_array(df[MEASURES].to_numpy(), MEASURES), complete)
+
+    batched = Moments(MEASURES)
+    for chunk in chunks:
+        batched.update(chunk[MEASURES].to_numpy())
+    check_state("batched updates equal pandas", batched, complete)
+
+    merged = Moments(MEASURES)
+    for part in (chunks[::3], chunks[1::3], chunks[2::3]):
+        partition = Moments(MEASURES)
+        for chunk in part:
+            partition.update(chunk[MEASURES].to_numpy())
+        merged.merge(partition)
+    check_state("merged partitions equal pandas", merged, complete)
+
+    # Large offset: a raw sum of squares would cancel catastrophically here
+    shifted = complete.assign(**{c: complete[c] + 1e9 for c in MEASURES})
+    stable = Moments(MEASURES)
+    for chunk in chunks_of(shifted, args.chunks):
+        stable.update(chunk[MEASURES].to_numpy())
+    check("variance stable under a 1e9 offset",
+          np.allclose(stable.variance().to_numpy(), complete[MEASURES].var().to_numpy(), rtol=1e-4))
+
+    by = ['region', 'device']
+    grouped = GroupedMoments(MEASURES, by)
+    for chunk in chunks:
+        grouped.update(chunk)
+    for key, part in complete.groupby(by, dropna=False):
+        # Missing devices stay None in the state's keys
+        key = tuple(None if pd.isna(v) else v for v in key)
+        check_state(f"grouped {key} equals pandas", grouped.groups[key], part)
+    check_state("grouped total equals pandas", grouped.total(), complete)
+
+    return check.summary("Moments match pandas.", "moments")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+"""
+Out-of-core check: the SQL versions of SAI, recurrence, device ratio,
+cross distribution, ranking and survival must match the pandas formulas
+they replaced, and an engine over the event store must run them, plus the
+streamed clustering, within its memory budget without holding a pandas
+copy of the events. Exit 1 on failure.
+
+    python verify_out_of_core.py
+    python verify_out_of_core.py --data dataset_espanol.xlsx --rows 2000000 --memory-limit 32MB
+"""
+import argparse
+import os
+import tempfile
+
+import duckdb
+import numpy as np
+import pandas as pd
+from lifelines import KaplanMeierFitter
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+from storage import write_event_store
+
+
+def events(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    watch = rng.gamma(2.0, 15.0, rows).round()
+    return pd.DataFrame({
+        'user_id': pd.Series(rng.integers(0, rows // 20, rows)).map('user_{}'.format),
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 180 * 86_400, rows), unit='s'),
+        'title': rng.choice([f'Title {i}' for i in range(500)], rows),
+        'genre': rng.choice(['Drama', 'Comedy', 'Action', 'Documentary'], rows),
+        'segment': rng.choice(['Kids', 'Family', 'Adults'], rows),
+        'region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'device': rng.choice(['Mobile', 'TV', 'Web'], rows),
+        'watch_time_minutes': watch,
+        'content_duration_minutes': rng.choice([30.0, 60.0, 120.0], rows),
+        'completion_rate': np.clip(watch / 60, 0, 1),
+    })
+
+
+def pandas_answers(df):
+    """The pandas implementations the SQL queries replaced."""
+    out = {}
+    if {'segment', 'genre'} <= set(df.columns):
+        global_share = df['genre'].value_counts() / len(df)
+        ct = pd.crosstab(df['segment'], df['genre'])
+        out['sai'] = (ct.div(ct.sum(axis=1), axis=0).div(global_share, axis=1) * 100).fillna(0)
+    ordered = df.sort_values(['user_id', 'timestamp'])
+    gaps = ordered['timestamp'] - ordered.groupby('user_id')['timestamp'].shift(1)
+    out['recurrence'] = {'avg_recurrence_days': gaps.dt.total_seconds().mean() / (3600 * 24),
+                         'unique_dates_count': df['timestamp'].dt.date.nunique()}
+    if 'device' in df.columns:
+        out['device_ratio'] = df.groupby('user_id')['device'].nunique().mean()
+    if {'region', 'device'} <= set(df.columns):
+        out['cross'] = df.pivot_table(index='region', columns='device', values='watch_time_minutes', aggfunc='mean')
+    target = next((c for c in ('title', 'titulo', 'content_name', 'nombre_contenido') if c in df.columns), 'genre')
+    out['ranking'] = df.groupby(target)['watch_time_minutes'].sum().sort_values(ascending=False)
+    watch = df['watch_time_minutes'].dropna()
+    out['survival'] = KaplanMeierFitter().fit(watch, event_observed=np.ones(len(watch))).survival_function_
+    return out
+
+
+def engine_answers(ae, wanted):
+    out = {}
+    if 'sai' in wanted:
+        out['sai'] = ae.get_sai()
+    out['recurrence'] = ae.get_recurrence_metrics()
+    if 'device_ratio' in wanted:
+        out['device_ratio'] = ae.get_device_ratio()
+    if 'cross' in wanted:
+        out['cross'] = ae.get_cross_distribution('region', 'device')
+    out['ranking'] = ae.get_top_content_ranking()
+    out['survival'] = ae.survival_analysis().survival_function_
+    return out
+
+
+def frame_of(value):
+    """Pivot tables and curves compared as long frames, whatever their column order."""
+    if isinstance(value, pd.DataFrame) and value.columns.name is not None:
+        return value.stack(future_stack=True).rename('value').reset_index()
+    if isinstance(value, pd.DataFrame):
+        return value.reset_index()
+    return value
+
+
+def check_dataset(check, name, df, memory_limit):
+    expected = pandas_answers(df)
+
+    memory = engine_answers(AnalyticsEngine(df), expected)
+    for answer in expected:
+        check(f"{name}: in-memory {answer} equals pandas", same(frame_of(memory[answer]), frame_of(expected[answer])))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = write_event_store(df, os.path.join(tmp, 'store'))
+        spill = os.path.join(tmp, 'spill')
+        ae = AnalyticsEngine.from_event_store(root, memory_limit=memory_limit, temp_directory=spill)
+
+        reference = duckdb.connect()
+        reference.execute(f"SET memory_limit = '{memory_limit}'")
+        budget = reference.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+        settings = ae.con.execute("SELECT current_setting('memory_limit'), current_setting('temp_directory')").fetchone()
+        check(f"{name}: store engine applies the memory budget", settings == (budget, spill), settings[0])
+        check(f"{name}: store engine holds no pandas copy", ae.df is None and ae.out_of_core)
+
+        store = engine_answers(ae, expected)
+        for answer in expected:
+            check(f"{name}: out-of-core {answer} equals pandas", same(frame_of(store[answer]), frame_of(expected[answer])))
+
+        clustered, features = ae.perform_clustering()
+        counts = clustered.aggregate("cluster, COUNT(*) AS n").df()
+        check(f"{name}: streamed clustering labels every row",
+              not isinstance(clustered, pd.DataFrame) and counts['n'].sum() == len(df)
+              and set(counts['cluster']) <= {0, 1, 2}, f"{len(counts)} clusters over {len(features)} features")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if out-of-core engines drift from pandas or their budget.")
+    parser.add_argument('--data', nargs='*', default=['autogravity_dataset.xlsx'])
+    parser.add_argument('--rows', type=int, default=300_000, help="rows of the generated dataset (0 to skip)")
+    parser.add_argument('--memory-limit', default='64MB')
+    args = parser.parse_args(argv)
+
+    check = Checks(62)
+    for path in args.data:
+        check_dataset(check, os.path.splitext(os.path.basename(path))[0], load_data(path)['dataset'], args.memory_limit)
+    if args.rows:
+        check_dataset(check, f"{args.rows:,} generated rows", events(args.rows), args.memory_limit)
+    return check.summary("Out-of-core engine matches pandas within its budget.", "out-of-core")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+"""
+Prefetch check: results computed in the background must equal foreground
+ones and be served from the store, a new selection must cancel queued work
+and interrupt running queries of the old one, a task still queued must be
+computed inline instead of waited on, another session's work must survive,
+and background engines must run single-threaded within the foreground
+engine's memory budget. Exit 1 on failure.
+
+    python verify_prefetch.py
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+from prefetch import PrefetchScheduler
+
+# Long enough to still be running when the selection changes
+SLOW_QUERY = "SELECT SUM(a.range * b.range) FROM range(200000) a, range(200000) b"
+SETTINGS = "SELECT current_setting('threads'), current_setting('memory_limit'), current_setting('temp_directory')"
+
+
+class Gate:
+    """A background task that blocks its worker until released."""
+
+    def __init__(self):
+        self.started, self.release = threading.Event(), threading.Event()
+
+    def __call__(self, ae):
+        self.started.set()
+        self.release.wait(30)
+        return 'gate'
+
+
+class Recorder:
+    """Wraps a compute function, recording the threads it ran on."""
+
+    def __init__(self, compute):
+        self.compute, self.threads = compute, []
+
+    def __call__(self, ae):
+        self.threads.append(threading.current_thread().name)
+        return self.compute(ae)
+
+
+def wait(scheduler, key, tasks, timeout=30):
+    deadline = time.monotonic() + timeout
+    while scheduler.progress(key, tasks)[0] < len(tasks) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return scheduler.progress(key, tasks)[0] == len(tasks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if background prefetch misbehaves.")
+    parser.add_argument('--data', default='autogravity_dataset.xlsx')
+    args = parser.parse_args(argv)
+
+    df = load_data(args.data)['dataset']
+    check = Checks(56)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spill = os.path.join(tmp, 'spill')
+        base = AnalyticsEngine(df, memory_limit='256MB', temp_directory=spill)
+        ae = base.filtered(filters={'region': df['region'].iloc[0]})
+        tasks = {'kpis': Recorder(lambda e: e.get_kpis()),
+                 'geo': Recorder(lambda e: e.get_geographic_stats()),
+                 'settings': Recorder(lambda e: e.con.execute(SETTINGS).fetchone())}
+
+        # Background results equal the foreground ones and come from the store
+        scheduler = PrefetchScheduler()
+        scheduler.prefetch('a', ae, tasks, session='s1')
+        ready = wait(scheduler, 'a', list(tasks))
+        check("prefetched tasks complete", ready, "%d of %d" % scheduler.progress('a', list(tasks)))
+        check("prefetch runs on the background worker",
+              all(t.threads and t.threads[0].startswith('tva-prefetch') for t in tasks.values()))
+        served = {name: scheduler.get('a', name, compute, ae) for name, compute in tasks.items()}
+        check("get() serves stored results without recomputing", all(len(t.threads) == 1 for t in tasks.values()))
+        check("prefetched results equal the foreground's",
+              same(served['kpis'], ae.get_kpis()) and same(served['geo'], ae.get_geographic_stats()))
+
+        threads, memory_limit, temp_directory = served['settings']
+        expected = base.con.execute(SETTINGS).fetchone()
+        check("background engines run single-threaded", int(threads) == 1, f"threads={threads}")
+        check("background engines keep the memory budget", (memory_limit, temp_directory) == expected[1:],
+              f"{memory_limit}, {temp_directory}")
+
+        # A task queued behind busy work is computed inline, not waited on
+        gate = Gate()
+        queued = Recorder(lambda e: e.get_kpis())
+        scheduler.prefetch('b', ae, {'gate': gate, 'kpis': queued}, session='s1')
+        gate.started.wait(30)
+        result = scheduler.get('b', 'kpis', queued, ae)
+        check("get() computes a queued task inline",
+              queued.threads == [threading.current_thread().name] and same(result, ae.get_kpis()))
+        gate.release.set()
+
+        # Moving to a new key cancels queued work of keys no session is on
+        gate, skipped = Gate(), Recorder(lambda e: e.get_kpis())
+        scheduler.prefetch('c', ae, {'gate': gate, 'kpis': skipped}, session='s1')
+        gate.started.wait(30)
+        scheduler.prefetch('d', ae, {'kpis': Recorder(lambda e: e.get_kpis())}, session='s1')
+        gate.release.set()
+        wait(scheduler, 'd', ['kpis'])
+        check("a new key cancels queued work of the old one", not skipped.threads
+              and scheduler.progress('c', ['kpis']) == (0, 1))
+
+        # ... but not work another session is still on
+        gate, kept = Gate(), Recorder(lambda e: e.get_kpis())
+        scheduler.prefetch('e', ae, {'gate': gate, 'kpis': kept}, session='s2')
+        gate.started.wait(30)
+        scheduler.prefetch('f', ae, {}, session='s3')
+        gate.release.set()
+        check("other sessions' work survives", wait(scheduler, 'e', ['kpis']) and len(kept.threads) == 1)
+
+        # A running query of a stale key is interrupted
+        slow = Recorder(lambda e: e.con.execute(SLOW_QUERY).fetchone())
+        scheduler.prefetch('g', ae, {'slow': slow}, session='s1')
+        while not slow.threads:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        started = time.monotonic()
+        scheduler.prefetch('h', ae, {'kpis': Recorder(lambda e: e.get_kpis())}, session='s1')
+        interrupted = wait(scheduler, 'h', ['kpis'], timeout=10)
+        check("a stale running query is interrupted",
+              interrupted and scheduler.progress('g', ['slow']) == (0, 1),
+              f"next task done after {time.monotonic() - started:.2f}s")
+
+        # Only the latest max_keys keys keep results
+        small = PrefetchScheduler(max_keys=2)
+        for key in 'xyz':
+            small.get(key, 'kpis', lambda e: e.get_kpis(), ae)
+        check("only the latest max_keys keys are kept",
+              [small.progress(key, ['kpis'])[0] for key in 'xyz'] == [0, 1, 1])
+
+    return check.summary("Prefetch serves consistent results.", "prefetch")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+"""
+Ingest profile check: the one-pass column stats must equal pandas, the
+coercion counts must match the values etl dropped, metadata answers from
+the profile must equal the SQL ones, zone maps must never skip a matching
+row (and do skip chunks on sorted data), and the profile must survive a
+save/load round trip. Exit 1 on failure.
+
+    python verify_profiling.py
+    python verify_profiling.py --rows 1000000 --chunk-size 16384
+"""
+import argparse
+import os
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+from profiling import DatasetProfile, profile_dataframe
+
+
+def events(rows, seed=42):
+    """Events sorted by time, as ingest usually sees them."""
+    rng = np.random.default_rng(seed)
+    watch = rng.gamma(2.0, 15.0, rows).round()
+    watch[rng.random(rows) < 0.02] = np.nan
+    return pd.DataFrame({
+        'user_id': pd.Series(rng.integers(0, rows // 10, rows)).map('user_{}'.format),
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 180 * 86_400, rows)), unit='s'),
+        'region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'device': rng.choice(['Mobile', 'TV', 'Web', None], rows, p=[0.45, 0.3, 0.2, 0.05]),
+        'watch_time_minutes': watch,
+        'completion_rate': np.clip(watch / 60, 0, 1),
+    })
+
+
+def pandas_stats(df):
+    stats = {}
+    for col in df.columns:
+        present = df[col].dropna()
+        s = {'rows': len(df), 'nulls': len(df) - len(present), 'distinct': present.nunique()}
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            s.update({'min': present.min(), 'max': present.max(), 'sum': present.sum(), 'mean': present.mean()})
+        elif pd.api.types.is_datetime64_any_dtype(df[col]):
+            s.update({'min': present.min().isoformat(), 'max': present.max().isoformat(),
+                      'distinct_dates': present.dt.date.nunique()})
+        stats[col] = s
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if the ingest profile disagrees with the data.")
+    parser.add_argument('--data', default='autogravity_dataset.xlsx')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--chunk-size', type=int, default=4_096)
+    args = parser.parse_args(argv)
+
+    check = Checks(56)
+    workbook = load_data(args.data)
+    generated = events(args.rows)
+    profiles = {args.data: (workbook['dataset'], workbook['profile']),
+                f"{args.rows:,} rows": (generated, profile_dataframe(generated, chunk_size=args.chunk_size))}
+
+    for name, (df, profile) in profiles.items():
+        expected = pandas_stats(df)
+        differing = [col for col, s in expected.items()
+                     if not same({key: profile.stat(col, key) for key in s}, s)]
+        check(f"{name}: column stats equal pandas", profile.rows == len(df) and not differing, ', '.join(differing))
+
+        plain, profiled = AnalyticsEngine(df), AnalyticsEngine(df, profile=profile)
+        check(f"{name}: profile KPIs equal SQL", same(profiled.get_kpis(), plain.get_kpis()))
+        check(f"{name}: profile metadata equals SQL",
+              all(same(profiled.get_distinct_values(col), plain.get_distinct_values(col)) for col in ('region', 'device'))
+              and same(profiled.get_time_bounds(), plain.get_time_bounds())
+              and same(profiled.get_recurrence_metrics(), plain.get_recurrence_metrics()))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            loaded = DatasetProfile.load(profile.save(os.path.join(tmp, 'profile.json')))
+        check(f"{name}: save/load round trip", same(loaded.to_dict(), profile.to_dict()))
+
+    # Zone maps on sorted data: filtered engines skip chunks but answer the same
+    df, profile = profiles[f"{args.rows:,} rows"]
+    selections = [({'region': 'East'}, None), ({}, ('2024-03-01', '2024-03-31')),
+                  ({'device': ['TV', 'Web']}, ('2024-05-10', '2024-05-20'))]
+    for filters, date_range in selections:
+        label = ' '.join([f"{k}={v}" for k, v in filters.items()] + ([f"{date_range[0]}..{date_range[1]}"] if date_range else []))
+        plain = AnalyticsEngine(df, filters=filters, date_range=date_range)
+        pruned = AnalyticsEngine(df, filters=filters, date_range=date_range, profile=profile)
+        check(f"{label}: zone-pruned engine answers the same",
+              same(pruned.get_kpis(), plain.get_kpis()) and same(pruned.get_time_series(), plain.get_time_series()),
+              f"{pruned.skipped_rows:,} of {len(df):,} rows skipped")
+    check("date ranges skip chunks of sorted data", pruned.skipped_rows > 0)
+
+    # Values etl could not coerce are counted per column
+    with tempfile.TemporaryDirectory() as tmp:
+        dirty = workbook['dataset'].head(50).copy()
+        dirty['timestamp'] = dirty['timestamp'].astype(object)
+        dirty['watch_time_minutes'] = dirty['watch_time_minutes'].astype(object)
+        dirty.loc[dirty.index[:3], 'timestamp'] = 'not a date'
+        dirty.loc[dirty.index[:5], 'watch_time_minutes'] = 'unknown'
+        path = os.path.join(tmp, 'dirty.xlsx')
+        dirty.to_excel(path, sheet_name='Dataset', index=False)
+        with warnings.catch_warnings():
+            # pandas warns that it parses the mixed timestamp column value by value
+            warnings.simplefilter('ignore', UserWarning)
+            report = load_data(path)['profile'].quality_report().set_index('column')['coercion_failures']
+    check("coercion failures counted per column",
+          report['timestamp'] == 3 and report['watch_time_minutes'] == 5, f"{report[report > 0].to_dict()}")
+
+    return check.summary("Profile matches the data.", "profiling")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+"""
+KLL check: on skewed and flat distributions, the sketch's quantiles must
+stay within its rank-error bound (mean <= 1.7 / k, worst of 99 quantiles
+<= 3.4 / k) whether it is fed at once, in batches or merged from
+partitions, grouped sketches must keep exact counts, and filtered engines
+must slice the dataset's sketches. Exit 1 on failure.
+
+    python verify_quantiles.py
+    python verify_quantiles.py --rows 5000000 --k 400
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from checks import Checks, same
+from analytics import AnalyticsEngine
+from quantiles import GroupedQuantiles, KLLSketch, QOE_QUANTILES
+
+RANKS = np.linspace(0.01, 0.99, 99)
+
+
+def rank_errors(sorted_values, estimates, qs=RANKS):
+    """Distance from each q to the rank interval its estimate covers (ties span several ranks)."""
+    low = np.searchsorted(sorted_values, estimates, side='left') / len(sorted_values)
+    high = np.searchsorted(sorted_values, estimates, side='right') / len(sorted_values)
+    return np.maximum(np.maximum(low - qs, qs - high), 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if KLL quantiles exceed their rank error.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--k', type=int, default=200)
+    parser.add_argument('--chunks', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(42)
+    k = args.k
+    mean_bound, max_bound = 1.7 / k, 3.4 / k
+    check = Checks(46)
+
+    distributions = {
+        'lognormal (startup times)': rng.lognormal(0.4, 0.3, args.rows),
+        'gamma (watch time)': rng.gamma(2.0, 15.0, args.rows).round(),
+        'uniform': rng.uniform(0, 1, args.rows),
+    }
+    for name, values in distributions.items():
+        truth = np.sort(values)
+        batches = np.array_split(values, args.chunks)
+        batched = KLLSketch(k)
+        for batch in batches:
+            batched.update(batch)
+        merged = KLLSketch(k)
+        for i, batch in enumerate(batches):
+            merged.merge(KLLSketch(k, seed=i).update(batch))
+        for mode, sketch in (('at once', KLLSketch(k).update(values)), ('batched', batched), ('merged', merged)):
+            errors = rank_errors(truth, sketch.quantiles(RANKS))
+            retained = sum(len(level) for level in sketch.levels)
+            check(f"{name}, {mode}",
+                  errors.mean() <= mean_bound and errors.max() <= max_bound
+                  and sketch.n == len(values) and sketch.min == truth[0] and sketch.max == truth[-1],
+                  f"rank error mean {errors.mean():.4f} max {errors.max():.4f}, {retained} items kept")
+
+    # Grouped sketches: exact counts and bounded error per group and roll-up
+    df = pd.DataFrame({
+        'region': rng.choice(['North', 'South', 'East', 'West', 'Central'], args.rows),
+        'device': rng.choice(['Mobile', 'TV', 'Web'], args.rows),
+        'video_startup_time_sec': distributions['lognormal (startup times)'],
+    })
+    grouped = GroupedQuantiles(['video_startup_time_sec'], ['region', 'device'], k=k)
+    edges = np.linspace(0, len(df), args.chunks + 1).astype(int)
+    for a, b in zip(edges[:-1], edges[1:]):
+        grouped.update(df.iloc[a:b])
+    summary = grouped.summary('video_startup_time_sec', by='region', quantiles=tuple(RANKS)).set_index('region')
+    worst, counts_exact = 0.0, True
+    for region, part in df.groupby('region')['video_startup_time_sec']:
+        row = summary.loc[region]
+        estimates = row[[f'p{q * 100:g}' for q in RANKS]].to_numpy(dtype='float64')
+        worst = max(worst, rank_errors(np.sort(part.to_numpy()), estimates).max())
+        counts_exact &= row['count'] == len(part)
+    check("grouped roll-up by region", worst <= max_bound and counts_exact, f"worst rank error {worst:.4f}")
+
+    # A slice holds copies of the matching groups, so it merges like them
+    slices = {'region': 'North', 'device': ['Mobile', 'TV']}
+    sliced = grouped.where(**slices).sketch('video_startup_time_sec')
+    merged = grouped.sketch('video_startup_time_sec', **slices)
+    check("slice equals its merged groups",
+          sliced.n == merged.n == (df['region'].eq('North') & df['device'].isin(slices['device'])).sum()
+          and (sliced.quantiles(RANKS) == merged.quantiles(RANKS)).all()
+          and sum(g['video_startup_time_sec'].n for g in grouped.groups.values()) == len(df))
+
+    # Filtered engines read percentiles from the dataset's sketches
+    df['watch_time_minutes'] = distributions['gamma (watch time)']
+    dataset = AnalyticsEngine(df).get_qoe_quantiles(k=k)
+    ae = AnalyticsEngine(df, filters={'region': 'North'}, qoe=dataset)
+    startup = ae.get_infrastructure_insights()['startup_percentiles']
+    part = np.sort(df.loc[df['region'] == 'North', 'video_startup_time_sec'].to_numpy())
+    errors = rank_errors(part, startup[[f'p{q * 100:g}' for q in QOE_QUANTILES]].to_numpy()[0], qs=np.array(QOE_QUANTILES))
+    check("engine percentiles sliced from the dataset",
+          list(startup['region']) == ['North'] and startup['count'][0] == len(part) and errors.max() <= max_bound
+          and same(ae.get_qoe_quantiles(k=k).summary('watch_time_minutes', by='device'),
+                   dataset.where(region='North').summary('watch_time_minutes', by='device')),
+          f"worst rank error {errors.max():.4f}")
+
+    return check.summary("KLL within its rank error.", "quantile")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
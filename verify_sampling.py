@@ -0,0 +1,97 @@
+"""
+Progressive-answer check: across filters and sample seeds, the stratified
+sample's KPI and breakdown estimates must sit inside their own intervals,
+the intervals must cover the exact answers at about their confidence, and
+error_target must size the sample to the requested precision. Exit 1 on
+failure.
+
+    python verify_sampling.py
+    python verify_sampling.py --rows 1000000 --seeds 40
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from checks import Checks
+from analytics import AnalyticsEngine
+from sampling import StratifiedSample
+
+KPIS = ['total_screentime', 'active_customers', 'avg_completion_pct', 'avg_watch_time']
+MEASURES = ['events', 'total_watch_time', 'avg_watch_time', 'unique_viewers']
+
+
+def events(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    region = rng.choice(['North', 'South', 'East', 'West', 'Central'], rows, p=[0.35, 0.3, 0.2, 0.1, 0.05])
+    # Watch time depends on the device, so strata and filters do not line up
+    device = rng.choice(['Mobile', 'TV', 'Web'], rows)
+    watch = rng.gamma(2.0, np.select([device == 'TV', device == 'Web'], [25.0, 10.0], 15.0)).round()
+    return pd.DataFrame({
+        'user_id': pd.Series(rng.zipf(1.5, rows) % (rows // 5)).map('user_{}'.format),
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 180 * 86_400, rows), unit='s'),
+        'genre': rng.choice(['Drama', 'Comedy', 'Action', 'Documentary'], rows),
+        'region': region,
+        'device': device,
+        'watch_time_minutes': watch,
+        'completion_rate': np.clip(watch / 60 + rng.normal(0, 0.1, rows), 0, 1),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if sample estimates miss their intervals.")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--size', type=int, default=5_000)
+    parser.add_argument('--seeds', type=int, default=20)
+    parser.add_argument('--coverage', type=float, default=0.88,
+                        help="minimum share of exact answers inside the 95%% intervals")
+    args = parser.parse_args(argv)
+
+    df = events(args.rows)
+    ae = AnalyticsEngine(df)
+    check = Checks(58)
+
+    selections = [({}, None), ({'region': 'Central'}, None), ({'device': ['TV', 'Web']}, None),
+                  ({'genre': 'Drama'}, ('2024-02-01', '2024-03-31'))]
+    engines = [ae.filtered(filters, date_range) for filters, date_range in selections]
+    exact = [engine.get_kpis() for engine in engines]
+    truth = df.groupby('device').agg(events=('user_id', 'size'), total_watch_time=('watch_time_minutes', 'sum'),
+                                     avg_watch_time=('watch_time_minutes', 'mean'),
+                                     unique_viewers=('user_id', 'nunique'))
+
+    covered = {name: [] for name in KPIS + [f'device {m}' for m in MEASURES]}
+    inside = True
+    for seed in range(args.seeds):
+        sample = StratifiedSample.from_engine(ae, size=args.size, seed=seed)
+        for engine, expected in zip(engines, exact):
+            engine.sample = sample
+            estimate = engine.estimate_kpis()
+            for name in KPIS:
+                inside &= estimate[f'{name}_low'] <= estimate[name] <= estimate[f'{name}_high']
+                covered[name].append(estimate[f'{name}_low'] <= expected[name] <= estimate[f'{name}_high'])
+        ae.sample = sample
+        breakdown = ae.estimate_breakdown('device').set_index('device')
+        for m in MEASURES:
+            low, high = breakdown[f'{m}_low'], breakdown[f'{m}_high']
+            inside &= bool(((low <= breakdown[m]) & (breakdown[m] <= high)).all())
+            exact_m = truth[m].reindex(breakdown.index)
+            covered[f'device {m}'].extend(((low <= exact_m) & (exact_m <= high)).tolist())
+
+    check("estimates lie inside their own intervals", inside)
+    for name, hits in covered.items():
+        check(f"{name} interval covers the exact answer", np.mean(hits) >= args.coverage,
+              f"{np.mean(hits):.0%} of {len(hits)}")
+
+    # error_target sizes the sample: half-widths of the unfiltered averages near the target
+    for target in (0.05, 0.02):
+        ae.get_sample(error_target=target)
+        estimate = ae.estimate_kpis()
+        width = (estimate['avg_watch_time_high'] - estimate['avg_watch_time']) / estimate['avg_watch_time']
+        check(f"error_target={target:g} gives avg_watch_time ±{target:.0%}",
+              width <= target * 1.1, f"±{width:.2%} from {estimate['sample_rows']:,} rows")
+
+    return check.summary("Sample estimates within their intervals.", "sampling")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,78 @@
+"""
+Concurrency check for the JSON query service: fires distinct concurrent
+queries at AnalyticsService over an in-memory engine and over a Parquet
+event store, and fails (exit 1) on any error or on a result that differs
+from the same query run alone.
+
+    python verify_service.py
+    python verify_service.py --data autogravity_dataset.xlsx --workers 8 --rounds 2
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+
+from checks import Checks
+from etl import load_data
+from analytics import AnalyticsEngine
+from service import AnalyticsService
+from storage import write_event_store
+
+ENDPOINTS = ('kpis', 'geographic_stats', 'top_content', 'sai')
+
+
+def queries(engine):
+    """Distinct (endpoint, params) pairs over every region x device filter."""
+    regions = ['All'] + engine.get_distinct_values('region')
+    devices = ['All'] + engine.get_distinct_values('device')
+    out = []
+    for endpoint in ENDPOINTS:
+        for region in regions:
+            for device in devices:
+                params = {k: v for k, v in (('region', region), ('device', device)) if v != 'All'}
+                out.append((endpoint, params))
+    return out
+
+
+async def fire(service, batch, rounds):
+    """Runs every query `rounds` times concurrently; returns results or exceptions."""
+    calls = [service.query(endpoint, dict(params)) for _ in range(rounds) for endpoint, params in batch]
+    return await asyncio.gather(*calls, return_exceptions=True)
+
+
+def run(engine, workers, rounds):
+    """Fires the queries concurrently; returns (ok, detail)."""
+    batch = queries(engine)
+    service = AnalyticsService(engine, max_workers=workers)
+    expected = [json.dumps(service._run(endpoint, params), sort_keys=True) for endpoint, params in batch]
+    results = asyncio.run(fire(service, batch, rounds))
+    service.executor.shutdown()
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    mismatches = sum(json.dumps(r, sort_keys=True) != expected[i % len(batch)]
+                     for i, r in enumerate(results) if not isinstance(r, Exception))
+    detail = f"{len(results)} queries, {len(errors)} errors, {mismatches} mismatches"
+    for error in errors[:3]:
+        detail += f"\n       {type(error).__name__}: {error}"
+    return not errors and not mismatches, detail
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if concurrent service queries error or disagree.")
+    parser.add_argument('--data', default='autogravity_dataset.xlsx')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=2, help="Times each distinct query is sent")
+    args = parser.parse_args(argv)
+
+    data = load_data(args.data)
+    check = Checks(12)
+    check('in-memory', *run(AnalyticsEngine(data['dataset'], profile=data['profile']), args.workers, args.rounds))
+    with tempfile.TemporaryDirectory() as root:
+        write_event_store(data['dataset'], root, profile=data['profile'])
+        check('event store', *run(AnalyticsEngine.from_event_store(root), args.workers, args.rounds))
+
+    return check.summary("Concurrent queries consistent.", "concurrency")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
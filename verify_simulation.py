@@ -0,0 +1,73 @@
+"""
+Gravity simulator check: the point projection must be the linear revenue
+model over per-user screentime, zero boost must mean zero uplift, the
+bootstrap must keep the variance of the total (also when it draws fewer
+users than it has), the bands must be ordered, and slider lookups must
+return the precomputed row and reject boosts off the grid. Exit 1 on failure.
+
+    python verify_simulation.py
+    python verify_simulation.py --users 500000 --scenarios 4000
+"""
+import argparse
+
+import numpy as np
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+from simulation import GravitySimulator, REVENUE_PER_MINUTE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if the Gravity simulator drifts from its model.")
+    parser.add_argument('--data', default='autogravity_dataset.xlsx')
+    parser.add_argument('--users', type=int, default=200_000, help="users of the generated population")
+    parser.add_argument('--scenarios', type=int, default=2_000)
+    args = parser.parse_args(argv)
+
+    check = Checks(54)
+
+    df = load_data(args.data)['dataset']
+    sim = GravitySimulator.from_engine(AnalyticsEngine(df), n_scenarios=args.scenarios)
+    total = df.dropna(subset=['user_id']).groupby('user_id')['watch_time_minutes'].sum().sum()
+    expected = total * REVENUE_PER_MINUTE * (1 + sim.surface.index.to_numpy() / 100)
+    check("point revenue is screentime x rate x boost", same(sim.surface['revenue'].tolist(), expected.tolist()),
+          f"${expected[0]:,.0f} at boost 0")
+    zero = sim.lookup(0)
+    check("zero boost means zero uplift", zero['uplift'] == zero['uplift_low'] == zero['uplift_high'] == 0)
+
+    surface = sim.surface
+    check("bands are ordered at every boost",
+          bool((surface['revenue_low'] <= surface['revenue_median']).all()
+               and (surface['revenue_median'] <= surface['revenue_high']).all()
+               and (surface['uplift_low'] <= surface['uplift_high']).all()
+               and (surface['ltv_low'] <= surface['ltv_high']).all()))
+    check("point revenue inside its band",
+          bool(surface['revenue'].between(surface['revenue_low'], surface['revenue_high']).all()))
+    check("lookup returns the precomputed row", same(sim.lookup(25), surface.loc[25].to_dict()))
+    outside = []
+    for boost in (-1, int(surface.index.max()) + 1):
+        try:
+            sim.lookup(boost)
+        except KeyError:
+            outside.append(boost)
+    check("lookup outside the grid raises KeyError", len(outside) == 2, f"raised for {outside}")
+    again = GravitySimulator.from_engine(AnalyticsEngine(df), n_scenarios=args.scenarios)
+    check("surface is deterministic for a seed", again.surface.equals(surface))
+
+    # Bootstrap spread of the total against its analytic value sqrt(n) * sd
+    rng = np.random.default_rng(7)
+    users = rng.gamma(0.8, 300.0, args.users)
+    analytic = np.sqrt(len(users)) * users.std()
+    for max_draws in (args.users, args.users // 10):
+        totals = GravitySimulator(users, n_scenarios=args.scenarios, boosts=[0], max_draws=max_draws).bootstrap_totals()
+        ratio = totals.std() / analytic
+        check(f"bootstrap keeps the total's spread, {max_draws:,} draws",
+              abs(ratio - 1) < 0.1 and abs(totals.mean() / users.sum() - 1) < 0.01,
+              f"sd ratio {ratio:.3f}")
+
+    return check.summary("Simulator matches its revenue model.", "simulation")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""
+Snapshot check: an engine over a memory-mapped Arrow snapshot must answer
+like the in-memory engine, filtered or not, opening the snapshot must map
+the file instead of copying it, the ingest profile must survive in the
+schema metadata, republishing must replace the file whole, and worker
+processes attaching to it must agree. Exit 1 on failure.
+
+    python verify_snapshot.py
+    python verify_snapshot.py --data dataset_espanol.xlsx dataset_custom.xlsx
+"""
+import argparse
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+
+from checks import Checks, same
+from etl import load_data
+from analytics import AnalyticsEngine
+from storage import open_snapshot, write_snapshot
+
+
+def answers(ae):
+    return {
+        'kpis': ae.get_kpis(),
+        'geo': ae.get_geographic_stats(),
+        'trend': ae.get_time_series(),
+        'ranking': ae.get_top_content_ranking(k=10),
+    }
+
+
+def worker_kpis(path):
+    return AnalyticsEngine.from_snapshot(path, threads=1).get_kpis()
+
+
+def check_snapshot(check, name, data, workers):
+    df = data['dataset']
+    region = df['region'].dropna().iloc[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'events.arrow')
+        write_snapshot(df, path, profile=data['profile'])
+        check(f"{name}: written in place without leftovers", os.listdir(tmp) == ['events.arrow'])
+
+        before = pa.total_allocated_bytes()
+        table, profile = open_snapshot(path)
+        allocated = pa.total_allocated_bytes() - before
+        check(f"{name}: open_snapshot maps the file instead of copying",
+              table.num_rows == len(df) and allocated < table.nbytes / 10,
+              f"{allocated:,} bytes allocated for a {table.nbytes:,} byte table")
+        check(f"{name}: profile kept in the schema metadata",
+              profile is not None and same(profile.to_dict(), data['profile'].to_dict()))
+
+        for filters, date_range in (({}, None), ({'region': region}, None),
+                                    ({}, (df['timestamp'].min().date(), df['timestamp'].median().date()))):
+            label = ' '.join([f"{k}={v}" for k, v in filters.items()] + (['first half'] if date_range else [])) or 'unfiltered'
+            snapshot = AnalyticsEngine.from_snapshot(path, filters=filters, date_range=date_range)
+            memory = AnalyticsEngine(df, filters=filters, date_range=date_range)
+            expected, got = answers(memory), answers(snapshot)
+            differing = [answer for answer in expected if not same(expected[answer], got[answer])]
+            check(f"{name}: {label}: snapshot equals in-memory", not differing, ', '.join(differing))
+
+        # Republishing swaps the whole file; engines opened later see the new one
+        write_snapshot(df[df['region'] == region], path)
+        republished = AnalyticsEngine.from_snapshot(path)
+        check(f"{name}: republished snapshot replaces the old one",
+              os.listdir(tmp) == ['events.arrow'] and republished.profile is None
+              and same(republished.get_kpis(), AnalyticsEngine(df, filters={'region': region}).get_kpis()))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(worker_kpis, [path] * workers))
+        check(f"{name}: worker processes agree on the snapshot", all(same(r, republished.get_kpis()) for r in results),
+              f"{len(results)} workers")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if Arrow snapshots disagree with the workbook.")
+    parser.add_argument('--data', nargs='+',
+                        default=['autogravity_dataset.xlsx', 'dataset/Datos de Streaming en México.xlsx'])
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    check = Checks(64)
+    for path in args.data:
+        check_snapshot(check, os.path.splitext(os.path.basename(path))[0], load_data(path), args.workers)
+    return check.summary("Snapshots match the in-memory engine.", "snapshot")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+"""
+Top-K check: exact rankings must equal pandas, and the streaming
+Space-Saving / Count-Min trackers must keep their error bounds on a skewed
+(Zipf) stream, across batches and merged partitions. Exit 1 on failure.
+
+    python verify_topk.py
+    python verify_topk.py --items 200000 --events 2000000 --capacity 500
+"""
+import argparse
+import math
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from checks import Checks
+from topk import exact_top_k, stream_heavy_hitters, CountMinSketch, HeavyHitters, SpaceSaving
+
+
+def zipf_events(events, items, seed=42):
+    rng = np.random.default_rng(seed)
+    ids = np.minimum(rng.zipf(1.3, events), items)
+    return pd.DataFrame({
+        'title': pd.Series(ids).map('title_{}'.format),
+        'watch_time_minutes': rng.gamma(2.0, 15.0, events).round(1),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if Top-K results leave their bounds.")
+    parser.add_argument('--items', type=int, default=50_000)
+    parser.add_argument('--events', type=int, default=500_000)
+    parser.add_argument('--capacity', type=int, default=1_000)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    df = zipf_events(args.events, args.items)
+    truth = df.groupby('title')['watch_time_minutes'].sum().sort_values(ascending=False, kind='stable')
+    con = duckdb.connect()
+    con.register('video_events', df)
+    check = Checks()
+
+    # Exact: SQL partial sort vs pandas
+    for k in (1, args.k, None):
+        ranking = exact_top_k(con, 'title', k)
+        expected = truth if k is None else truth.head(k)
+        check(f"exact_top_k(k={k}) equals pandas",
+              len(ranking) == len(expected)
+              and np.allclose(ranking.to_numpy(), expected.to_numpy())
+              and np.allclose(truth.reindex(ranking.index).to_numpy(), ranking.to_numpy()))
+
+    # Space-Saving: count - error <= true <= count, unmonitored <= floor
+    edges = np.linspace(0, len(df), 21).astype(int)
+    chunks = [df.iloc[a:b] for a, b in zip(edges[:-1], edges[1:])]
+    merged = SpaceSaving(args.capacity)
+    for part in np.array_split(np.arange(len(chunks)), 4):
+        partition = SpaceSaving(args.capacity)
+        for i in part:
+            partition.update(chunks[i]['title'], chunks[i]['watch_time_minutes'])
+        merged.merge(partition)
+    for name, summary in (("batched + merged", merged),
+                          ("single pass", SpaceSaving(args.capacity).update(df['title'], df['watch_time_minutes']))):
+        true = truth.reindex(summary.counts.index).fillna(0).to_numpy()
+        lower = (summary.counts - summary.errors).to_numpy()
+        within = np.all(lower <= true + 1e-6) and np.all(true <= summary.counts.to_numpy() + 1e-6)
+        unmonitored = truth.drop(summary.counts.index, errors='ignore')
+        check(f"Space-Saving bounds ({name})",
+              within and (unmonitored.empty or unmonitored.max() <= summary.floor + 1e-6),
+              f"floor {summary.floor:,.0f}")
+        guaranteed = summary.top(args.k).index[summary.guaranteed(args.k).to_numpy()]
+        check(f"Space-Saving guaranteed top-{args.k} ({name})",
+              set(guaranteed) <= set(truth.head(args.k).index),
+              f"{len(guaranteed)} of {args.k} guaranteed")
+
+    # Count-Min: never undercounts; overcount <= eps * total for >= 1 - delta of items
+    sketch = CountMinSketch()
+    for chunk in chunks:
+        sketch.update(chunk['title'], chunk['watch_time_minutes'])
+    estimate = sketch.estimate(truth.index.values).to_numpy()
+    eps, delta = math.e / sketch.width, math.exp(-sketch.depth)
+    over = estimate - truth.to_numpy()
+    share = np.mean(over <= eps * sketch.total + 1e-6)
+    check("Count-Min never undercounts", np.all(over >= -1e-6))
+    check("Count-Min overcount within eps * total", share >= 1 - delta, f"{share:.4f} of items (need {1 - delta:.4f})")
+
+    # Streaming tracker out of DuckDB: the heavy hitters of a Zipf stream match
+    tracker = stream_heavy_hitters(con, 'title', capacity=args.capacity)
+    check(f"stream_heavy_hitters top-{args.k} equals pandas",
+          list(tracker.top(args.k).index) == list(truth.head(args.k).index))
+    merged_tracker = HeavyHitters(args.capacity)
+    for chunk in chunks:
+        merged_tracker.merge(HeavyHitters(args.capacity).update(chunk['title'], chunk['watch_time_minutes']))
+    check(f"merged HeavyHitters top-{args.k} equals pandas",
+          list(merged_tracker.top(args.k).index) == list(truth.head(args.k).index))
+
+    return check.summary("Top-K within bounds.", "Top-K")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())